@@ -0,0 +1,54 @@
+"""
+批量规划基准测试
+
+在同一组随机起终点对上比较不同进程数下plan_many的吞吐量，
+并校验结果与单进程一致。需要在存在metro_info.json的目录下运行：
+
+    python bench/bench_batch.py [起终点对数量] [最大进程数]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xianmetro.core import get_route_graph, plan_many  # noqa: E402
+
+
+def run(num_pairs=20000, max_workers=None, strategy=2, seed=0):
+    """
+    运行基准测试并打印结果
+
+    Args:
+        num_pairs: 起终点对数量
+        max_workers: 最大进程数，默认为CPU核心数
+        strategy: 选择策略
+        seed: 随机种子
+    """
+    graph = get_route_graph()
+    random.seed(seed)
+    pairs = [
+        (random.choice(graph.station_ids), random.choice(graph.station_ids))
+        for _ in range(num_pairs)
+    ]
+    max_workers = max_workers or os.cpu_count() or 1
+
+    reference = None
+    workers = 1
+    while workers <= max_workers:
+        begin = time.perf_counter()
+        results = list(plan_many(pairs, strategy, workers=workers,
+                                 graph=graph))
+        elapsed = time.perf_counter() - begin
+        print(f"  {workers:>3} workers  {num_pairs / elapsed:10.0f} pairs/s")
+        if reference is None:
+            reference = results
+        elif results != reference:
+            print(f"  !! {workers} workers: results differ from 1 worker")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,68 @@
+"""
+搜索引擎基准测试
+
+在同一组随机起终点上比较各搜索引擎的耗时和扩展状态数，并校验各引擎
+得到的路线代价一致。需要在存在metro_info.json的目录下运行：
+
+    python bench/bench_engines.py [查询次数] [随机种子]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xianmetro.core import get_route_graph, plan_route  # noqa: E402
+from xianmetro.core.planner import ENGINES  # noqa: E402
+
+STRATEGY_NAMES = {1: "least transfer", 2: "least stops", 3: "shortest distance"}
+
+
+def run(num_queries=200, seed=0):
+    """
+    运行基准测试并打印结果
+
+    Args:
+        num_queries: 每种策略的查询次数
+        seed: 随机种子
+    """
+    graph = get_route_graph()
+    graph.route_table = None  # 只比较搜索本身
+    random.seed(seed)
+    pairs = [
+        (random.choice(graph.station_ids), random.choice(graph.station_ids))
+        for _ in range(num_queries)
+    ]
+    engines = [engine for engine in ENGINES if engine != "auto"]
+
+    for strategy, name in STRATEGY_NAMES.items():
+        print(f"== strategy {strategy} ({name}), {num_queries} queries ==")
+        costs = {}
+        for engine in engines:
+            expanded = 0
+            results = []
+            begin = time.perf_counter()
+            for start, end in pairs:
+                stats = {}
+                result = plan_route(start, end, strategy, graph=graph,
+                                    engine=engine, stats=stats)
+                expanded += stats.get("expanded", 0)
+                results.append(result and (result["transfers"],
+                                           result["total_stops"],
+                                           result["total_distance"]))
+            elapsed = time.perf_counter() - begin
+            costs[engine] = results
+            print(f"  {engine:<14} {elapsed * 1000 / num_queries:8.3f} ms/query"
+                  f"  {expanded / num_queries:10.1f} states expanded/query")
+        reference = costs[engines[0]]
+        for engine in engines[1:]:
+            mismatches = sum(a != b for a, b in zip(reference, costs[engine]))
+            if mismatches:
+                print(f"  !! {engine}: {mismatches} cost mismatches "
+                      f"against {engines[0]}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
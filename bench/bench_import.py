@@ -0,0 +1,68 @@
+"""
+导入耗时基准测试
+
+在全新的子进程中分别导入核心模块，测量导入耗时，
+并列出被连带导入的重量级依赖（GUI库、网络库等）：
+
+    python bench/bench_import.py [重复次数]
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要测量的模块
+MODULES = ("xianmetro.core", "xianmetro.fetch", "xianmetro.utils")
+
+# 无界面使用时不应被导入的重量级依赖
+HEAVY_MODULES = ("PyQt5", "qfluentwidgets", "requests", "yaml")
+
+_PROBE = """
+import sys, time
+begin = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - begin
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure(module):
+    """
+    在新的子进程中导入模块
+
+    Args:
+        module: 模块名
+
+    Returns:
+        tuple: (导入耗时（秒）, 被导入的重量级依赖列表)
+    """
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True,
+        capture_output=True, text=True
+    ).stdout.splitlines()[-1].split()  # GUI库导入时可能会打印横幅
+    heavy = output[1].split(",") if len(output) > 1 else []
+    return float(output[0]), heavy
+
+
+def run(repeat=5):
+    """
+    运行基准测试并打印结果
+
+    Args:
+        repeat: 每个模块的重复次数，取最小值
+    """
+    for module in MODULES:
+        timings = []
+        for _ in range(repeat):
+            elapsed, heavy = measure(module)
+            timings.append(elapsed)
+        print(f"  {module:<18} {min(timings) * 1000:8.1f} ms  "
+              f"heavy: {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from xianmetro.core import get_route_graph, get_graph_registry
+from xianmetro.fetch import (
+    create_session, get_data_version, get_data_file, load_from_file
+)
+from xianmetro.main import apply_data_update
+from xianmetro.ui.data_updater import DataUpdateThread
+from xianmetro.ui.main_window import MetroPlannerUI
+
+# 两站一线的最小数据
+PAYLOAD = {"l": [{
+    "ln": "1号线", "lo": "0", "cl": "ff0000",
+    "st": [
+        {"sl": "108.90,34.20", "rs": "1 1", "n": "甲站"},
+        {"sl": "108.91,34.21", "rs": "2 2", "n": "乙站"}
+    ]
+}]}
+
+
+class _PayloadHandler(BaseHTTPRequestHandler):
+    """/subway返回PAYLOAD，其余路径返回404的请求处理器"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status = 200 if self.path == "/subway" else 404
+        body = json.dumps(PAYLOAD).encode("utf-8") if status == 200 else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDataUpdateThread(unittest.TestCase):
+
+    CITY = "测试城"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        # 数据文件和HTTP缓存写在临时目录中，主窗口使用默认数据文件的副本
+        load_from_file()  # 数据文件不存在时先下载
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        shutil.copy(get_data_file(), self.tmp_dir.name)
+        os.chdir(self.tmp_dir.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _PayloadHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.01}, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.session = create_session(retries=0, backoff_factor=0)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def check(self, path="/subway"):
+        thread = DataUpdateThread(self.CITY, url=self.base + path,
+                                  session=self.session)
+        signals = []
+        thread.data_checked.connect(
+            lambda *args: signals.append(args), Qt.DirectConnection)
+        thread.start()
+        self.assertTrue(thread.wait(5000))
+        self.assertEqual(len(signals), 1)
+        return signals[0]
+
+    def test_data_checked(self):
+        self.assertEqual(self.check(), (self.CITY, True, ""))
+        # 新数据的图已在后台线程中构建好
+        registry = get_graph_registry()
+        self.assertIn(self.CITY, registry)
+        graph = get_route_graph(self.CITY)
+        self.assertEqual(graph.version, get_data_version(self.CITY))
+        self.assertEqual(self.check(), (self.CITY, False, ""))
+        self.assertIs(get_route_graph(self.CITY), graph)
+
+    def test_data_check_failed(self):
+        city, changed, error = self.check("/missing")
+        self.assertEqual((city, changed), (self.CITY, False))
+        self.assertIn("404", error)
+
+    def test_apply_data_update(self):
+        self.check()
+        window = MetroPlannerUI()
+        window.start_input.setText("甲站")
+        window.end_input.setText("乙")
+        self.assertFalse(apply_data_update(window, self.CITY, True,
+                                           "", "其他城市"))
+        self.assertFalse(apply_data_update(window, self.CITY, False,
+                                           "", self.CITY))
+        self.assertFalse(apply_data_update(window, self.CITY, True,
+                                           "offline", self.CITY))
+        # 消息对话框是模态的，测试中只记录调用
+        with mock.patch("xianmetro.main.show_message") as show_message:
+            self.assertTrue(apply_data_update(window, self.CITY, True,
+                                              "", self.CITY))
+        show_message.assert_called_once()
+        self.assertEqual(
+            [window.start_input.itemText(idx)
+             for idx in range(window.start_input.count())],
+            ["甲站", "乙站"])
+        # 已输入的起终点保留
+        self.assertEqual(window.start_input.text(), "甲站")
+        self.assertEqual(window.end_input.text(), "乙")
+
+
+if __name__ == "__main__":
+    unittest.main()
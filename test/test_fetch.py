@@ -0,0 +1,397 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from xianmetro.utils import write_atomic
+from xianmetro.fetch import (
+    load_from_file, save_to_file, get_dataset, get_line_color,
+    get_station_list, get_id_list, get_metro_info, create_session,
+    get_session, fetch_metro_info, update_metro_info, get_data_version,
+    get_data_file, refresh_cities, get_current_city, set_current_city
+)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """按服务器上的脚本依次返回响应的请求处理器"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.condition:
+            # 记录同时进行的请求数的峰值；要求together个请求同时进行时，
+            # 等到其他请求到达后再响应（顺序请求时超时后继续，峰值仍为1）
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            server.condition.notify_all()
+            server.condition.wait_for(
+                lambda: server.in_flight >= server.together, timeout=5)
+        try:
+            self.respond()
+        finally:
+            with server.condition:
+                server.in_flight -= 1
+
+    def respond(self):
+        server = self.server
+        server.requests.append(self.client_address)
+        server.headers.append(self.headers)
+        if self.path in server.paths:
+            status, delay = server.paths[self.path]
+        elif server.script:
+            status, delay = server.script.pop(0)
+        else:
+            status, delay = 200, 0
+        time.sleep(delay)
+        body = json.dumps(server.payload).encode("utf-8")
+        if status == 200 and server.etag and \
+                self.headers.get("If-None-Match") == server.etag:
+            status, body = 304, b""
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if server.etag:
+                self.send_header("ETag", server.etag)
+            if server.last_modified:
+                self.send_header("Last-Modified", server.last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端已超时断开
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMetroInfoRequest(unittest.TestCase):
+
+    def setUp(self):
+        # HTTP缓存写在数据文件旁，测试在临时目录中进行
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.requests = []
+        self.server.headers = []
+        self.server.script = []
+        self.server.paths = {}
+        self.server.payload = {"l": []}
+        self.server.etag = None
+        self.server.last_modified = None
+        self.server.condition = threading.Condition()
+        self.server.in_flight = 0
+        self.server.peak = 0
+        self.server.together = 1
+        self.url = f"http://127.0.0.1:{self.server.server_port}/subway"
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.01},
+                                       daemon=True)
+        self.thread.start()
+        self.session = create_session(retries=3, backoff_factor=0)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def fetch(self, timeout=(1, 1)):
+        return get_metro_info(url=self.url, session=self.session,
+                              timeout=timeout)
+
+    def test_success(self):
+        self.assertEqual(self.fetch(), {"l": []})
+
+    def test_retry_on_server_error(self):
+        self.server.script = [(503, 0), (502, 0)]
+        self.assertEqual(self.fetch(), {"l": []})
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_gives_up_after_retries(self):
+        self.server.script = [(500, 0)] * 10
+        with self.assertRaises(requests.HTTPError):
+            self.fetch()
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_no_retry_on_client_error(self):
+        self.server.script = [(404, 0)]
+        with self.assertRaises(requests.HTTPError):
+            self.fetch()
+        self.assertEqual(len(self.server.requests), 1)
+
+    def record_backoffs(self):
+        """
+        记录每次重试前的退避时间，并跳过实际等待
+
+        Returns:
+            tuple: (上下文管理器, 退避时间列表)
+        """
+        backoffs = []
+        get_backoff_time = Retry.get_backoff_time
+
+        def record(retry):
+            backoffs.append(get_backoff_time(retry))
+            return 0
+
+        return mock.patch.object(Retry, "get_backoff_time", record), backoffs
+
+    def test_exponential_backoff(self):
+        self.session = create_session(retries=3, backoff_factor=0.1)
+        self.server.script = [(503, 0)] * 3
+        patch, backoffs = self.record_backoffs()
+        with patch:
+            self.fetch()
+        self.assertEqual(len(self.server.requests), 4)
+        # 第一次重试不等待，之后依次等待0.2秒和0.4秒
+        self.assertEqual(backoffs, [0, 0.2, 0.4])
+
+    def test_read_timeout(self):
+        self.session = create_session(retries=1, backoff_factor=0)
+        self.server.script = [(200, 1.0), (200, 1.0)]
+        with self.assertRaises(requests.ConnectionError) as context:
+            self.fetch(timeout=(1, 0.1))
+        self.assertIsInstance(context.exception.args[0].reason,
+                              ReadTimeoutError)
+        # 读取超时后重试一次
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_retry_on_connection_error(self):
+        self.server.shutdown()
+        self.server.server_close()
+        patch, backoffs = self.record_backoffs()
+        with patch:
+            with self.assertRaises(requests.ConnectionError):
+                self.fetch()
+        self.assertEqual(len(backoffs), 3)
+
+    def test_connection_reused(self):
+        self.fetch()
+        self.fetch()
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0], self.server.requests[1])
+
+    def test_shared_session(self):
+        self.assertIs(get_session(), get_session())
+
+    def test_conditional_request_with_etag(self):
+        self.server.etag = '"v1"'
+        body, changed = fetch_metro_info(url=self.url, session=self.session)
+        self.assertTrue(changed)
+        body_again, changed = fetch_metro_info(url=self.url,
+                                               session=self.session)
+        self.assertFalse(changed)
+        self.assertEqual(body_again, body)
+        self.assertEqual(self.server.headers[1]["If-None-Match"], '"v1"')
+        # 304时返回缓存的响应
+        self.assertEqual(self.fetch(), {"l": []})
+
+    def test_conditional_request_with_last_modified(self):
+        self.server.last_modified = "Wed, 01 Oct 2025 00:00:00 GMT"
+        self.fetch()
+        self.fetch()
+        self.assertNotIn("If-Modified-Since", self.server.headers[0])
+        self.assertEqual(self.server.headers[1]["If-Modified-Since"],
+                         self.server.last_modified)
+
+    def test_changed_payload(self):
+        self.server.etag = '"v1"'
+        fetch_metro_info(url=self.url, session=self.session)
+        self.server.etag = '"v2"'
+        self.server.payload = {"l": [], "v": 2}
+        body, changed = fetch_metro_info(url=self.url, session=self.session)
+        self.assertTrue(changed)
+        self.assertEqual(json.loads(body), {"l": [], "v": 2})
+
+    def test_same_payload_without_validators(self):
+        fetch_metro_info(url=self.url, session=self.session)
+        _, changed = fetch_metro_info(url=self.url, session=self.session)
+        self.assertFalse(changed)
+
+    def test_update_only_on_change(self):
+        self.server.etag = '"v1"'
+        city = "测试城"
+        self.assertTrue(update_metro_info(city, self.url, self.session))
+        version = get_data_version(city)
+        self.assertFalse(update_metro_info(city, self.url, self.session))
+        self.assertEqual(get_data_version(city), version)
+        self.server.etag = '"v2"'
+        self.server.payload = {"l": [], "v": 2}
+        self.assertTrue(update_metro_info(city, self.url, self.session))
+        self.assertNotEqual(get_data_version(city), version)
+
+    def test_update_after_failed_save(self):
+        self.server.etag = '"v1"'
+        city = "测试城"
+        self.assertTrue(update_metro_info(city, self.url, self.session))
+        self.server.etag = '"v2"'
+        self.server.payload = {"l": [], "v": 2}
+        # 新的响应已写入HTTP缓存，但数据文件保存失败，仍是v1的数据
+        with mock.patch("xianmetro.fetch.fetch_data.save_to_file",
+                        side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                update_metro_info(city, self.url, self.session)
+        version = get_data_version(city)
+        self.assertTrue(update_metro_info(city, self.url, self.session))
+        self.assertNotEqual(get_data_version(city), version)
+        self.assertEqual(self.server.headers[-1]["If-None-Match"], '"v2"')
+        self.assertFalse(update_metro_info(city, self.url, self.session))
+
+    def test_update_without_city(self):
+        city = get_current_city()
+        set_current_city(None)
+        try:
+            self.assertTrue(update_metro_info(url=self.url,
+                                              session=self.session))
+            self.assertFalse(update_metro_info(url=self.url,
+                                               session=self.session))
+        finally:
+            set_current_city(city)
+        # HTTP缓存与数据文件都对应DATA_FILE
+        self.assertEqual(sorted(os.listdir(".")), [
+            "metro_info.http.json", "metro_info.json", "metro_info.response"
+        ])
+
+    def test_update_same_city_concurrently(self):
+        # 后台更新线程和刷新按钮同时更新同一城市
+        self.server.script = [(200, 0.1)] * 4
+        city = "测试城"
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                update_metro_info(city, self.url, self.session)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [False, False, False, True])
+        with open(get_data_file(city), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [])
+        self.assertFalse([name for name in os.listdir(".")
+                          if name.endswith(".tmp")])
+
+    def test_refresh_cities_concurrently(self):
+        base = self.url.rsplit("/", 1)[0]
+        cities = {f"城市{idx}": f"{base}/{idx}" for idx in range(4)}
+        self.server.paths["/3"] = (500, 0)
+        self.server.together = 4
+        self.session = create_session(retries=0, backoff_factor=0)
+        report = refresh_cities(cities, max_workers=4, session=self.session)
+        self.assertEqual(self.server.peak, 4)  # 四个城市同时请求
+        self.assertEqual(list(report), list(cities))
+        self.assertEqual(
+            [result["status"] for result in report.values()],
+            ["updated", "updated", "updated", "failed"])
+        self.assertIn("HTTPError", report["城市3"]["error"])
+        for city in ("城市0", "城市1", "城市2"):
+            with open(get_data_file(city), encoding="utf-8") as f:
+                self.assertEqual(json.load(f), [])
+        self.assertFalse(os.path.exists(get_data_file("城市3")))
+        self.assertFalse([name for name in os.listdir(".")
+                          if name.endswith(".tmp")])
+
+    def test_refresh_concurrency_limit(self):
+        base = self.url.rsplit("/", 1)[0]
+        cities = {f"城市{idx}": f"{base}/{idx}" for idx in range(4)}
+        self.server.together = 2
+        report = refresh_cities(cities, max_workers=2, session=self.session)
+        self.assertEqual(self.server.peak, 2)
+        self.assertEqual({result["status"] for result in report.values()},
+                         {"updated"})
+
+
+class TestWriteAtomic(unittest.TestCase):
+
+    def test_concurrent_writes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metro_info.json")
+            contents = [bytes([idx]) * 100000 for idx in range(8)]
+            threads = [threading.Thread(target=write_atomic, args=(path, data))
+                       for data in contents]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with open(path, "rb") as f:
+                self.assertIn(f.read(), contents)
+            self.assertEqual(os.listdir(tmp_dir), ["metro_info.json"])
+
+
+class TestDataset(unittest.TestCase):
+
+    def setUp(self):
+        # 测试会重写数据文件，在临时目录中使用数据文件的副本
+        load_from_file()  # 数据文件不存在时先下载
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        shutil.copy(get_data_file(), self.tmp_dir.name)
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_dataset_is_reused(self):
+        self.assertIs(get_dataset(), get_dataset())
+
+    def test_invalidated_after_save(self):
+        dataset = get_dataset()
+        save_to_file(load_from_file())
+        self.assertIsNot(get_dataset(), dataset)
+
+    def test_kept_across_cities(self):
+        save_to_file(load_from_file(), "测试城")
+        dataset = get_dataset()
+        other = get_dataset("测试城")
+        self.assertIsNot(other, dataset)
+        self.assertIs(get_dataset(), dataset)
+        self.assertIs(get_dataset("测试城"), other)
+
+    def test_saved_while_loading(self):
+        # 读取数据文件期间后台线程写入了新数据
+        load = load_from_file
+
+        def load_then_save(city=None):
+            metro_info = load(city)
+            save_to_file(metro_info, city)
+            return metro_info
+
+        save_to_file(load_from_file())
+        with mock.patch("xianmetro.fetch.fetch_data.load_from_file",
+                        load_then_save):
+            dataset = get_dataset()
+        self.assertLess(dataset.version, get_data_version())
+        self.assertIsNot(get_dataset(), dataset)
+
+    def test_indices_match_file(self):
+        metro_info = load_from_file()
+        ids = [sid for line in metro_info for sid in line['stations']]
+        names = [info['station_name'] for line in metro_info
+                 for info in line['stations'].values()]
+        self.assertEqual(get_id_list(), ids)
+        self.assertEqual(get_station_list(), names)
+        line = metro_info[0]
+        self.assertEqual(get_line_color(line['line_name']),
+                         f"#{line['color']}")
+        self.assertEqual(get_line_color("不存在的线路"), "#000000")
+
+    def test_lists_are_copies(self):
+        get_station_list().clear()
+        self.assertTrue(get_station_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,19 @@
+import os
+import shutil
+import tempfile
+import threading
 import unittest
-from xianmetro.core.load_graph import parse_stations
-from xianmetro.station import Station
+from unittest import mock
+from xianmetro.core import load_graph
+from xianmetro.core.load_graph import (
+    parse_stations, get_route_graph, RouteGraph, GraphRegistry
+)
+from xianmetro.core.graph_cache import save_compiled_graph, load_compiled_graph
+from xianmetro.fetch import (
+    load_from_file, save_to_file, get_data_file, get_data_version
+)
+from xianmetro.station import Station, StationInLine
+from xianmetro.utils import haversine
 
 class TestStation(unittest.TestCase):
 
@@ -27,6 +40,13 @@ class TestStation(unittest.TestCase):
         self.assertIn("2号线", line_names)
         self.assertIn("3号线", line_names)
 
+    def test_compact_objects(self):
+        station = self.stations["1422 1052|1422 1052"]
+        self.assertFalse(hasattr(station, "__dict__"))
+        self.assertFalse(hasattr(station.line[0], "__dict__"))
+        with self.assertRaises(AssertionError):
+            Station("test", "0", [object()], (0.0, 0.0))
+
     def test_loop_line_station(self):
         # 环线首尾相接
         s_jingshangcun = self.stations["1621 582|1621 582"]
@@ -36,5 +56,179 @@ class TestStation(unittest.TestCase):
         self.assertEqual(jing_line.prev_station_id, "1521 583|1521 583")  # 首的前是尾
         self.assertEqual(yu_line.next_station_id, "1621 582|1621 582")    # 尾的后是首
 
+class TestRouteGraph(unittest.TestCase):
+
+    def setUp(self):
+        # 测试会重写数据文件，在临时目录中使用数据文件的副本
+        load_from_file()  # 数据文件不存在时先下载
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        shutil.copy(get_data_file(), self.tmp_dir.name)
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_graph_is_reused(self):
+        self.assertIs(get_route_graph(), get_route_graph())
+
+    def test_graph_rebuilt_after_save(self):
+        graph = get_route_graph()
+        save_to_file(load_from_file())
+        new_graph = get_route_graph()
+        self.assertIsNot(new_graph, graph)
+        self.assertEqual(set(new_graph.stations), set(graph.stations))
+
+    def test_transfer_station_adjacency(self):
+        graph = get_route_graph()
+        lines = {line for _, line, _ in graph.neighbors("1422 1052|1422 1052")}
+        self.assertEqual(lines, {"2号线", "3号线"})
+
+    def test_edge_distances_precomputed(self):
+        graph = get_route_graph()
+        for station_id in graph.station_ids:
+            lat1, lon1 = graph.stations[station_id].coords
+            for neighbor_id, _, distance in graph.neighbors(station_id):
+                lat2, lon2 = graph.stations[neighbor_id].coords
+                self.assertAlmostEqual(
+                    distance, haversine(lat1, lon1, lat2, lon2))
+
+    def test_line_transfer_graph(self):
+        graph = get_route_graph()
+        self.assertIn("3号线", graph.line_transfers("2号线"))
+        self.assertIn("2号线", graph.line_transfers("3号线"))
+        self.assertNotIn("2号线", graph.line_transfers("2号线"))
+
+    def test_state_numbering(self):
+        graph = get_route_graph()
+        self.assertEqual(len(graph.station_states), len(graph.station_ids) + 1)
+        self.assertEqual(len(graph.edge_offsets), len(graph.station_ids) + 1)
+        for state in range(graph.num_states):
+            station_id, line_name = graph.state_pair(state)
+            self.assertEqual(graph.station_state(station_id, line_name), state)
+        for station_id in graph.station_ids:
+            self.assertEqual(
+                graph.station_lines(station_id),
+                [line.line_name for line in graph.stations[station_id].line])
+
+    def test_line_offsets(self):
+        graph = get_route_graph()
+        offsets = graph.line_offsets["1号线"]
+        self.assertEqual(offsets["136 338"], 0.0)
+        self.assertIn("8号(环)线", graph.loop_lines)
+        self.assertNotIn("1号线", graph.loop_lines)
+        distance = graph.line_distance(
+            "1号线", "136 338", "1422 803|1422 803")
+        self.assertAlmostEqual(distance, offsets["1422 803|1422 803"])
+
+    def test_compiled_graph_roundtrip(self):
+        graph = RouteGraph(parse_stations(), data_hash="ab" * 32)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metro_info.graph")
+            save_compiled_graph(graph, path)
+            self.assertIsNone(load_compiled_graph("cd" * 32, path=path))
+            loaded = load_compiled_graph(graph.data_hash, path=path)
+        self.assertIsNotNone(loaded)
+        for name, value in vars(graph).items():
+            if name != "stations":
+                self.assertEqual(getattr(loaded, name), value, name)
+        for station_id, station in graph.stations.items():
+            other = loaded.stations[station_id]
+            self.assertEqual((other.name, other.coords),
+                             (station.name, station.coords))
+            for line, other_line in zip(station.line, other.line):
+                for name in StationInLine.__slots__:
+                    self.assertEqual(getattr(other_line, name),
+                                     getattr(line, name), name)
+
+class TestGraphRegistry(unittest.TestCase):
+
+    CITY = "测试城"
+
+    def setUp(self):
+        # 测试城市的数据文件写在临时目录中，默认数据文件使用副本
+        metro_info = load_from_file()
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        shutil.copy(get_data_file(), self.tmp_dir.name)
+        os.chdir(self.tmp_dir.name)
+        save_to_file(metro_info, self.CITY)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_per_city_data(self):
+        self.assertNotEqual(get_data_file(self.CITY), get_data_file())
+        self.assertNotEqual(get_data_version(self.CITY), get_data_version())
+        graph = get_route_graph(self.CITY)
+        self.assertIsNot(graph, get_route_graph())
+        self.assertEqual(graph.station_ids, get_route_graph().station_ids)
+
+    def test_switch_back_is_cached(self):
+        graph = get_route_graph(self.CITY)
+        get_route_graph()
+        self.assertIs(get_route_graph(self.CITY), graph)
+
+    def test_lru_eviction(self):
+        registry = GraphRegistry(1)
+        graph = registry.get(self.CITY)
+        registry.get(None)
+        self.assertEqual(registry.cities(), [None])
+        self.assertIsNot(registry.get(self.CITY), graph)
+
+    def test_rebuilt_after_save(self):
+        registry = GraphRegistry(2)
+        graph = registry.get(self.CITY)
+        save_to_file(load_from_file(self.CITY), self.CITY)
+        self.assertIsNot(registry.get(self.CITY), graph)
+
+    def test_build_outside_lock(self):
+        # 构建一个城市的图时，其他城市仍可访问注册表
+        registry = GraphRegistry(2)
+        graph = registry.get(None)
+        started, release = threading.Event(), threading.Event()
+        load = load_graph._load_graph
+
+        def slow_load_graph(city, version):
+            if city == self.CITY:
+                started.set()
+                release.wait(5)
+            return load(city, version)
+
+        result = []
+        with mock.patch.object(load_graph, "_load_graph", slow_load_graph):
+            thread = threading.Thread(
+                target=lambda: result.append(registry.get(self.CITY)))
+            thread.start()
+            self.assertTrue(started.wait(5))
+            other = threading.Thread(target=registry.get, args=(None,))
+            other.start()
+            other.join(1)
+            self.assertFalse(other.is_alive())
+            release.set()
+            thread.join()
+        self.assertIs(registry.get(None), graph)
+        self.assertIs(registry.get(self.CITY), result[0])
+
+    def test_data_saved_during_build(self):
+        registry = GraphRegistry(2)
+        load = load_graph._load_graph
+
+        def load_then_save(city, version):
+            graph = load(city, version)
+            if not saved:
+                # 构建完成前后台线程写入了新数据
+                saved.append(True)
+                save_to_file(load_from_file(city), city)
+            return graph
+
+        saved = []
+        with mock.patch.object(load_graph, "_load_graph", load_then_save):
+            graph = registry.get(self.CITY)
+        self.assertEqual(graph.version, get_data_version(self.CITY))
+        self.assertIs(registry.get(self.CITY), graph)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestHeadlessImport(unittest.TestCase):
+
+    def test_core_without_gui(self):
+        code = (
+            "import sys\n"
+            "import xianmetro.core, xianmetro.fetch, xianmetro.utils\n"
+            "print(','.join(m for m in ('PyQt5', 'qfluentwidgets', 'requests')"
+            " if m in sys.modules))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True,
+            capture_output=True, text=True
+        ).stdout.strip()
+        self.assertEqual(output, "")
+
+    def test_ui_helpers_still_exported(self):
+        from xianmetro.utils import show_message, get_price_text
+        self.assertTrue(callable(show_message))
+        self.assertTrue(callable(get_price_text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,23 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
 import unittest
-from xianmetro.core import plan_route
+from xianmetro.core import (
+    plan_route, plan_routes, get_route_graph, get_path_tree, find_reachable,
+    plan_pareto_routes, pick_strategy_routes, plan_alternatives,
+    plan_extra_routes, RouteCache, get_route_cache, plan_many, RouteGraph
+)
+from xianmetro.fetch import load_from_file, save_to_file, get_data_file
+from xianmetro.core.search import (
+    dijkstra_search, least_transfer_search, get_strategy_key
+)
+from xianmetro.core.load_graph import GraphRegistry
+from xianmetro.core.route_table import (
+    build_route_table, save_route_table, load_route_table,
+    get_route_table_file, main as route_table_main
+)
 
 class TestRoutePlanning(unittest.TestCase):
 
@@ -28,5 +46,331 @@ class TestRoutePlanning(unittest.TestCase):
         self.assertIsInstance(result, dict)
         self.assertEqual(result["total_stops"], 1)
 
+    def test_strategy_objectives(self):
+        start, end = "136 338", "1756 749|1756 749"
+        r1, r2, r3 = (plan_route(start, end, strategy=s) for s in (1, 2, 3))
+        self.assertLessEqual(r1["transfers"], r2["transfers"])
+        self.assertLessEqual(r1["transfers"], r3["transfers"])
+        self.assertLessEqual(r2["total_stops"], r1["total_stops"])
+        self.assertLessEqual(r2["total_stops"], r3["total_stops"])
+        self.assertLessEqual(r3["total_distance"], r1["total_distance"])
+        self.assertLessEqual(r3["total_distance"], r2["total_distance"])
+
+    def test_invalid_strategy(self):
+        with self.assertRaises(ValueError):
+            plan_route("1422 803|1422 803", "1756 749|1756 749", strategy=4)
+
+    def test_plan_routes_matches_plan_route(self):
+        start, end = "136 338", "1756 749|1756 749"
+        results = plan_routes(start, end)
+        self.assertEqual(list(results), [1, 2, 3])
+        for strategy, result in results.items():
+            expected = plan_route(start, end, strategy=strategy)
+            self.assertEqual(result["transfers"], expected["transfers"])
+            self.assertEqual(result["total_stops"], expected["total_stops"])
+            self.assertEqual(result["total_distance"],
+                             expected["total_distance"])
+
+    def test_plan_routes_unreachable(self):
+        self.assertEqual(plan_routes("136 338", "no such station"),
+                         {1: None, 2: None, 3: None})
+
+    def test_plan_routes_shares_identical_routes(self):
+        start = "1422 803|1422 803"
+        results = plan_routes(start, start)
+        self.assertIs(results[1], results[2])
+        self.assertIs(results[1], results[3])
+        for end in ("1756 749|1756 749", "1422 749|1422 749", "136 338"):
+            results = plan_routes(start, end)
+            for a in (1, 2, 3):
+                for b in (1, 2, 3):
+                    if results[a] == results[b]:
+                        self.assertIs(results[a], results[b])
+
+    def test_line_level_least_transfer(self):
+        graph = get_route_graph()
+        for start in ("136 338", "1422 749|1422 749"):
+            for end in ("1756 749|1756 749", "1521 583|1521 583"):
+                full = dijkstra_search(graph, start, end, 1)
+                pruned = least_transfer_search(graph, start, end)
+                self.assertEqual(full[1:3], pruned[1:3])
+                self.assertAlmostEqual(full[3], pruned[3])
+
+    def test_route_table_lookup(self):
+        graph = get_route_graph()
+        original_table = graph.route_table
+        table = build_route_table(graph, workers=1)
+        start, end = "136 338", "1756 749|1756 749"
+        try:
+            for strategy in (1, 2, 3):
+                graph.route_table = None
+                expected = plan_route(start, end, strategy=strategy)
+                graph.route_table = table
+                result = plan_route(start, end, strategy=strategy)
+                self.assertEqual(result["transfers"], expected["transfers"])
+                self.assertEqual(result["total_stops"],
+                                 expected["total_stops"])
+                self.assertEqual(result["total_distance"],
+                                 expected["total_distance"])
+        finally:
+            graph.route_table = original_table
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metro_info.routes")
+            save_route_table(table, path)
+            loaded = load_route_table(graph, path)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(loaded.lookup(start, end, 2),
+                             table.lookup(start, end, 2))
+
+    def test_route_table_command(self):
+        # 命令行按城市构建路线表，应用加载该城市的图时能找到它
+        city = "测试城"
+        metro_info = load_from_file()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                save_to_file(metro_info, city)
+                with contextlib.redirect_stdout(io.StringIO()) as output:
+                    route_table_main([city, "--workers", "1"])
+                self.assertIn(get_route_table_file(city), output.getvalue())
+                self.assertTrue(os.path.exists(get_route_table_file(city)))
+                self.assertFalse(os.path.exists(get_route_table_file(None)))
+                graph = GraphRegistry(1).get(city)
+                self.assertIsNotNone(graph.route_table)
+            finally:
+                os.chdir(cwd)
+
+    def test_bidirectional_engine(self):
+        stations = list(get_route_graph().stations)
+        for start in stations[::5]:
+            for end in stations[::7]:
+                for strategy in (1, 2, 3):
+                    expected = plan_route(start, end, strategy,
+                                          engine="dijkstra")
+                    stats = {}
+                    result = plan_route(start, end, strategy,
+                                        engine="bidirectional", stats=stats)
+                    self.assertEqual(result["transfers"],
+                                     expected["transfers"])
+                    self.assertEqual(result["total_stops"],
+                                     expected["total_stops"])
+                    self.assertEqual(result["total_distance"],
+                                     expected["total_distance"])
+                    self.assertIn("expanded", stats)
+
+    def test_astar_engine(self):
+        start, end = "136 338", "1756 749|1756 749"
+        dijkstra_stats, astar_stats = {}, {}
+        expected = plan_route(start, end, 3, engine="dijkstra",
+                              stats=dijkstra_stats)
+        result = plan_route(start, end, 3, engine="astar", stats=astar_stats)
+        self.assertEqual(result["total_distance"], expected["total_distance"])
+        self.assertEqual(result["transfers"], expected["transfers"])
+        self.assertLessEqual(astar_stats["expanded"],
+                             dijkstra_stats["expanded"])
+
+    def test_path_tree(self):
+        start = "1422 803|1422 803"
+        tree = get_path_tree(start, 2)
+        self.assertIs(get_path_tree(start, 2), tree)
+        for end in list(get_route_graph().stations)[::3]:
+            self.assertEqual(tree.route_to(end),
+                             plan_route(start, end, 2, engine="dijkstra"))
+        self.assertIsNone(tree.route_to("no such station"))
+        results = plan_routes(start, "1756 749|1756 749", use_trees=True)
+        self.assertEqual(results, plan_routes(start, "1756 749|1756 749"))
+
+    def test_find_reachable(self):
+        start = "1422 803|1422 803"
+        everything = find_reachable(start)
+        self.assertEqual(set(everything), set(get_route_graph().stations))
+        for end, costs in list(everything.items())[::4]:
+            self.assertEqual(min(cost[0] for cost in costs),
+                             plan_route(start, end, 1)["transfers"])
+            self.assertEqual(min(cost[1] for cost in costs),
+                             plan_route(start, end, 2)["total_stops"])
+
+        bounded = find_reachable(start, max_stops=8, max_transfers=1)
+        self.assertIn(start, bounded)
+        for costs in bounded.values():
+            for transfers, stops, _ in costs:
+                self.assertLessEqual(transfers, 1)
+                self.assertLessEqual(stops, 8)
+        for end in everything:
+            result = plan_route(start, end, 2)
+            if result["total_stops"] <= 8 and result["transfers"] <= 1:
+                self.assertIn(end, bounded)
+        self.assertEqual(find_reachable("no such station"), {})
+
+    def test_pareto_front(self):
+        stations = list(get_route_graph().stations)
+        for start in stations[::11]:
+            for end in stations[::13]:
+                front = plan_pareto_routes(start, end)
+                costs = [(r["transfers"], r["total_stops"],
+                          r["total_distance"]) for r in front]
+                self.assertEqual(costs, sorted(costs))
+                for a in costs:
+                    for b in costs:
+                        if a is not b:
+                            self.assertFalse(all(x <= y
+                                                 for x, y in zip(a, b)))
+                picked = pick_strategy_routes(front)
+                for strategy in (1, 2, 3):
+                    expected = plan_route(start, end, strategy,
+                                          engine="dijkstra")
+                    self.assertEqual(
+                        (picked[strategy]["transfers"],
+                         picked[strategy]["total_stops"],
+                         picked[strategy]["total_distance"]),
+                        (expected["transfers"], expected["total_stops"],
+                         expected["total_distance"]))
+        self.assertEqual(plan_pareto_routes("136 338", "no such station"), [])
+
+    def test_plan_alternatives(self):
+        start, end = "136 338", "1756 749|1756 749"
+        for strategy in (1, 2, 3):
+            routes = plan_alternatives(start, end, strategy, k=4)
+            self.assertGreaterEqual(len(routes), 1)
+            self.assertLessEqual(len(routes), 4)
+            best = plan_route(start, end, strategy, engine="dijkstra")
+            self.assertEqual(
+                (routes[0]["transfers"], routes[0]["total_stops"],
+                 routes[0]["total_distance"]),
+                (best["transfers"], best["total_stops"],
+                 best["total_distance"]))
+            make_key = get_strategy_key(strategy)
+            keys = [make_key(r["transfers"], r["total_stops"],
+                             r["total_distance"]) for r in routes]
+            self.assertEqual(keys, sorted(keys))
+            signatures = set()
+            for route in routes:
+                stations = [sid for segment in route["route"]
+                            for sid in segment["stations"]]
+                self.assertEqual(len(stations), len(set(stations)))
+                self.assertGreater(len(route["route"][0]["stations"]), 1)
+                signatures.add(tuple(stations))
+            self.assertEqual(len(signatures), len(routes))
+        self.assertEqual(plan_alternatives(start, "no such station", 1), [])
+
+        # 环线首尾两站之间沿两个方向的路线都会保留
+        routes = plan_alternatives("1621 582|1621 582", "1521 583|1521 583",
+                                   1, k=2)
+        self.assertEqual(len(routes), 2)
+        for route in routes:
+            self.assertEqual([segment["line"] for segment in route["route"]],
+                             ["8号(环)线"])
+        self.assertNotEqual(routes[0]["route"][0]["stations"][1],
+                            routes[1]["route"][0]["stations"][1])
+
+        # 网络中至少有一部分起终点存在多条走法
+        stations = list(get_route_graph().stations)
+        self.assertTrue(any(
+            len(plan_alternatives(start, end, 2, k=2)) > 1
+            for start in stations[::7] for end in stations[::5]))
+
+    def test_plan_extra_routes(self):
+        stations = list(get_route_graph().stations)
+        found = False
+        for start in stations[::11]:
+            for end in stations[::13]:
+                extra = plan_extra_routes(start, end, 3)
+                self.assertLessEqual(len(extra), 3)
+                strategy_routes = plan_routes(start, end,
+                                              use_trees=True).values()
+                for result in extra:
+                    self.assertNotIn(result, strategy_routes)
+                found = found or bool(extra)
+                # 再次规划直接命中路线结果缓存，返回新生成的副本
+                hits = get_route_cache().hits
+                again = plan_extra_routes(start, end, 3)
+                self.assertEqual(get_route_cache().hits, hits + 1)
+                self.assertEqual(again, extra)
+                if extra:
+                    self.assertIsNot(again[0], extra[0])
+        self.assertTrue(found)
+
+    def test_plan_many(self):
+        stations = list(get_route_graph().stations)
+        pairs = [(start, end) for start in stations[::9]
+                 for end in stations[::10]]
+        expected = [plan_route(start, end, 2) for start, end in pairs]
+        # 批量规划不读写路线结果缓存
+        stats = get_route_cache().stats()
+        self.assertEqual(list(plan_many(pairs, 2, workers=1)), expected)
+        self.assertEqual(get_route_cache().stats(), stats)
+        self.assertEqual(
+            list(plan_many(iter(pairs), 2, workers=2, chunk_size=7)),
+            expected)
+        with self.assertRaises(ValueError):
+            list(plan_many(pairs, 4))
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            plan_route("136 338", "1756 749|1756 749", 1, engine="bfs")
+
+class TestRouteCache(unittest.TestCase):
+
+    def test_hits_misses_evictions(self):
+        graph = get_route_graph()
+        cache = RouteCache(2)
+        result = plan_route("136 338", "1756 749|1756 749", 1, engine="dijkstra")
+        self.assertEqual(cache.get(graph, "a", "b", 1), (False, None))
+        cache.put(graph, "a", "b", 1, result)
+        cache.put(graph, "a", "c", 1, None)
+        self.assertEqual(cache.get(graph, "a", "b", 1), (True, result))
+        self.assertEqual(cache.get(graph, "a", "c", 1), (True, None))
+        cache.put(graph, "a", "d", 1, result)
+        self.assertEqual(cache.get(graph, "a", "b", 1), (False, None))
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 2,
+                                         "evictions": 1, "size": 2,
+                                         "capacity": 2})
+
+    def test_results_are_copies(self):
+        start, end = "136 338", "1756 749|1756 749"
+        first = plan_route(start, end, 2)
+        first["route"][0]["stations"].clear()
+        hits = get_route_cache().hits
+        second = plan_route(start, end, 2)
+        self.assertEqual(get_route_cache().hits, hits + 1)
+        self.assertEqual(second, plan_route(start, end, 2, engine="dijkstra"))
+
+    def test_keyed_by_data_hash(self):
+        start, end = "136 338", "1756 749|1756 749"
+        plan_route(start, end, 3)
+        self.assertGreater(len(get_route_cache()), 0)
+        # 在临时目录中重写数据文件的副本
+        metro_info = load_from_file()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shutil.copy(get_data_file(), tmp_dir)
+            os.chdir(tmp_dir)
+            try:
+                # 内容相同的数据写入后结果仍然有效
+                save_to_file(metro_info)
+                hits = get_route_cache().hits
+                plan_route(start, end, 3)
+                self.assertEqual(get_route_cache().hits, hits + 1)
+                # 内容变化后不再命中
+                metro_info[0]["color"] = "123456"
+                save_to_file(metro_info)
+                misses = get_route_cache().misses
+                plan_route(start, end, 3)
+                self.assertEqual(get_route_cache().misses, misses + 1)
+            finally:
+                os.chdir(cwd)
+
+    def test_kept_across_cities(self):
+        start, end = "136 338", "1756 749|1756 749"
+        graph = get_route_graph()
+        other = RouteGraph(graph.stations, version=-1, data_hash="ab" * 32)
+        plan_route(start, end, 2, graph)
+        plan_route(start, end, 2, other)
+        hits = get_route_cache().hits
+        plan_route(start, end, 2, graph)
+        self.assertEqual(get_route_cache().hits, hits + 1)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
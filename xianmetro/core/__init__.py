@@ -4,4 +4,10 @@ __author__ = "imoscarz"
 __description__ = "核心功能模块，负责地铁路线规划。"
 
 from .load_graph import *
-from .planner import plan_route
+from .planner import (
+    plan_route, plan_routes, plan_pareto_routes, pick_strategy_routes,
+    plan_alternatives, plan_extra_routes, get_path_tree, ShortestPathTree,
+    find_reachable
+)
+from .route_cache import RouteCache, get_route_cache
+from .batch import plan_many
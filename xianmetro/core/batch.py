@@ -0,0 +1,116 @@
+"""
+批量路线规划模块
+
+为大量起终点对（OD矩阵）规划路线。路线规划图只在子进程启动时传递一次，
+起终点对按块分发给进程池，结果按输入顺序以迭代器的形式逐个返回。
+批量规划的起终点对很少重复，子进程之间也不共享缓存，因此不使用
+路线结果缓存，交互查询的缓存结果不会被批量规划挤掉。
+"""
+
+import os
+from collections import deque
+from itertools import islice
+
+from xianmetro.core.load_graph import get_route_graph
+from xianmetro.core.planner import plan_route
+from xianmetro.core.search import get_strategy_key
+
+# 每块包含的起终点对数量
+DEFAULT_CHUNK_SIZE = 256
+
+# 子进程中的路线规划图，由进程池初始化函数设置
+_worker_graph = None
+
+
+def _init_worker(graph):
+    """
+    进程池初始化函数：每个子进程只接收一次路线规划图
+
+    Args:
+        graph: 路线规划图
+    """
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _plan_chunk(chunk, strategy, graph=None):
+    """
+    规划一块起终点对的路线
+
+    Args:
+        chunk: (起始站ID, 目标站ID)列表
+        strategy: 选择策略（1-3）
+        graph: 路线规划图，默认使用子进程中的图
+
+    Returns:
+        list: 路线结果列表，与chunk一一对应
+    """
+    graph = graph or _worker_graph
+    return [plan_route(start, end, strategy, graph=graph, use_cache=False)
+            for start, end in chunk]
+
+
+def _chunks(pairs, size):
+    """
+    将起终点对按块切分，输入可以是任意可迭代对象
+
+    Args:
+        pairs: (起始站ID, 目标站ID)的可迭代对象
+        size: 每块的数量
+
+    Yields:
+        list: 一块起终点对
+    """
+    iterator = iter(pairs)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def plan_many(pairs, strategy, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              graph=None):
+    """
+    批量规划路线
+
+    起终点对按chunk_size切块后交给进程池并行规划，同时在途的块数
+    限制为进程数的两倍，因此输入可以是生成器，内存占用不随总量增长。
+    结果严格按输入顺序逐个产出，先完成的块会等待之前的块。
+
+    Args:
+        pairs: (起始站ID, 目标站ID)的可迭代对象
+        strategy: 选择策略（1-3）
+        workers: 进程数，默认为CPU核心数；为1时在当前进程中计算
+        chunk_size: 每块的起终点对数量
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+
+    Yields:
+        dict: 路线结果（格式同plan_route），未找到路径时为None
+
+    Raises:
+        ValueError: 如果策略编号无效
+    """
+    get_strategy_key(strategy)  # 校验策略编号
+    if graph is None:
+        graph = get_route_graph()
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for chunk in _chunks(pairs, chunk_size):
+            yield from _plan_chunk(chunk, strategy, graph)
+        return
+
+    # 进程池只在并行时才需要，延迟导入以免拖慢核心模块的导入
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(graph,)) as executor:
+        pending = deque()
+        for chunk in _chunks(pairs, chunk_size):
+            pending.append(executor.submit(_plan_chunk, chunk, strategy))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,349 @@
+"""
+编译图缓存模块
+
+把由metro_info.json构建出的路线规划图（站点数组、CSR邻接数组、
+预先计算的距离和线路累计距离）编译为紧凑的二进制文件，保存在数据文件旁。
+进程启动时只需一次读取即可恢复整个图，无需解析JSON和重新构建邻接表。
+文件记录源数据的SHA-256，数据内容变化后自动视为过期并重建。
+
+文件格式（小端序）：
+    头部：魔数b"XMGC"、格式版本、数据文件的SHA-256、站点数、状态数、
+          边数、线路数、线路换乘关系数、字符串区字节数
+    字符串区：以\\0分隔的UTF-8字符串（站点ID、站点名称、线路名称等），
+              前"站点数"个字符串依次是各站点ID
+    数组区：按_field_layout的顺序依次存放各数组，不存在的值（如环线外
+            没有前一站）用-1或NaN表示
+"""
+
+import math
+import os
+import struct
+import sys
+from array import array
+
+from xianmetro.station import Station, StationInLine
+from xianmetro.fetch import get_data_file
+from xianmetro.utils.write_file import write_atomic
+from xianmetro.core.load_graph import RouteGraph
+
+MAGIC = b"XMGC"
+FORMAT_VERSION = 1
+
+# 魔数、格式版本、填充、哈希、站点数、状态数、边数、线路数、线路换乘关系数、
+# 字符串区字节数
+_HEADER = struct.Struct("<4sHxx32sIIIIII")
+
+_NAN = float("nan")
+
+
+def get_graph_cache_file(city=None):
+    """
+    获取编译图缓存文件路径（与数据文件同目录同名，扩展名为.graph）
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        str: 编译图缓存文件路径
+    """
+    return os.path.splitext(get_data_file(city))[0] + ".graph"
+
+
+def _field_layout(num_stations, num_states, num_edges, num_lines,
+                  num_links):
+    """
+    数组区的布局
+
+    Args:
+        num_stations: 站点数
+        num_states: 状态数
+        num_edges: 边数
+        num_lines: 线路数
+        num_links: 线路换乘关系数
+
+    Returns:
+        list: [(字段名, 类型码, 元素个数), ...]
+    """
+    return [
+        ("station_states", "i", num_stations + 1),
+        ("station_name", "i", num_stations),
+        ("station_lat", "d", num_stations),
+        ("station_lon", "d", num_stations),
+        ("state_station", "i", num_states),
+        ("state_line", "i", num_states),
+        ("state_line_id", "i", num_states),
+        ("state_prev", "i", num_states),
+        ("state_next", "i", num_states),
+        ("state_prev_distance", "d", num_states),
+        ("state_next_distance", "d", num_states),
+        ("state_offset", "d", num_states),
+        ("edge_offsets", "i", num_stations + 1),
+        ("edge_target", "i", num_edges),
+        ("edge_line", "i", num_edges),
+        ("edge_length", "d", num_edges),
+        ("line_name", "i", num_lines),
+        ("line_length", "d", num_lines),
+        ("line_loop", "b", num_lines),
+        ("line_neighbor_offsets", "i", num_lines + 1),
+        ("line_neighbor_target", "i", num_links),
+    ]
+
+
+def _optional(value):
+    """None转换为NaN"""
+    return _NAN if value is None else value
+
+
+def _restore(value):
+    """NaN转换回None"""
+    return None if math.isnan(value) else value
+
+
+def compile_graph(graph):
+    """
+    将路线规划图编译为缓存文件内容
+
+    Args:
+        graph: 路线规划图（需要带有data_hash）
+
+    Returns:
+        bytes: 文件内容
+    """
+    strings = list(graph.station_ids)
+    string_index = {value: idx for idx, value in enumerate(strings)}
+
+    def intern(value):
+        if value is None:
+            return -1
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    fields = {
+        "station_states": graph.station_states,
+        "state_station": graph.state_station,
+        "state_line": graph.state_line,
+        "edge_offsets": graph.edge_offsets,
+        "edge_target": graph.edge_target,
+        "edge_line": graph.edge_line,
+        "edge_length": graph.edge_length,
+        "line_name": array("i", (intern(name) for name in graph.line_names)),
+        "line_length": array("d", (graph.line_lengths.get(name, 0.0)
+                                   for name in graph.line_names)),
+        "line_loop": array("b", (name in graph.loop_lines
+                                 for name in graph.line_names)),
+        "line_neighbor_offsets": array("i", [0]),
+        "line_neighbor_target": array("i"),
+    }
+    for neighbors in graph.line_neighbors:
+        fields["line_neighbor_target"].extend(neighbors)
+        fields["line_neighbor_offsets"].append(
+            len(fields["line_neighbor_target"]))
+
+    station_name = fields["station_name"] = array("i")
+    station_lat = fields["station_lat"] = array("d")
+    station_lon = fields["station_lon"] = array("d")
+    for station_id in graph.station_ids:
+        station_obj = graph.stations[station_id]
+        station_name.append(intern(station_obj.name))
+        station_lat.append(station_obj.coords[0])
+        station_lon.append(station_obj.coords[1])
+
+    for name in ("state_line_id", "state_prev", "state_next"):
+        fields[name] = array("i")
+    for name in ("state_prev_distance", "state_next_distance",
+                 "state_offset"):
+        fields[name] = array("d")
+    for station_id in graph.station_ids:
+        for st_line in graph.stations[station_id].line:
+            fields["state_line_id"].append(intern(st_line.line_id))
+            fields["state_prev"].append(intern(st_line.prev_station_id))
+            fields["state_next"].append(intern(st_line.next_station_id))
+            fields["state_prev_distance"].append(
+                _optional(st_line.prev_distance))
+            fields["state_next_distance"].append(
+                _optional(st_line.next_distance))
+            fields["state_offset"].append(_optional(
+                graph.line_offsets.get(st_line.line_name, {})
+                .get(station_id)))
+
+    blob = "\0".join(strings).encode("utf-8")
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, bytes.fromhex(graph.data_hash),
+        len(graph.station_ids), graph.num_states, len(graph.edge_target),
+        len(graph.line_names), len(fields["line_neighbor_target"]), len(blob)
+    )
+    parts = [header, blob]
+    for name, typecode, _ in _field_layout(
+            len(graph.station_ids), graph.num_states, len(graph.edge_target),
+            len(graph.line_names), len(fields["line_neighbor_target"])):
+        values = array(typecode, fields[name])
+        if sys.byteorder != "little":
+            values.byteswap()
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def _read_fields(data, counts, offset):
+    """
+    从文件内容中读出数组区的全部数组
+
+    Args:
+        data: 文件内容
+        counts: (站点数, 状态数, 边数, 线路数, 线路换乘关系数)
+        offset: 数组区的起始偏移
+
+    Returns:
+        dict: 字段名到array的映射；长度与文件不符时返回None
+    """
+    view = memoryview(data)
+    fields = {}
+    for name, typecode, length in _field_layout(*counts):
+        values = array(typecode)
+        end = offset + length * values.itemsize
+        if end > len(data):
+            return None
+        values.frombytes(view[offset:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        fields[name] = values
+        offset = end
+    if offset != len(data):
+        return None
+    return fields
+
+
+def decompile_graph(data, data_hash, version=None):
+    """
+    由缓存文件内容恢复路线规划图
+
+    Args:
+        data: 文件内容
+        data_hash: 当前数据文件的SHA-256
+        version: 数据版本号
+
+    Returns:
+        RouteGraph: 路线规划图；格式不符或哈希不一致时返回None
+    """
+    if len(data) < _HEADER.size:
+        return None
+    (magic, format_version, digest, num_stations, num_states, num_edges,
+     num_lines, num_links, blob_size) = _HEADER.unpack_from(data)
+    if (magic != MAGIC or format_version != FORMAT_VERSION
+            or digest.hex() != data_hash):
+        return None
+    offset = _HEADER.size + blob_size
+    strings = data[_HEADER.size:offset].decode("utf-8").split("\0")
+    fields = _read_fields(
+        data, (num_stations, num_states, num_edges, num_lines, num_links),
+        offset)
+    if fields is None:
+        return None
+
+    def lookup(idx):
+        return strings[idx] if idx != -1 else None
+
+    station_ids = strings[:num_stations]
+    line_names = [strings[idx] for idx in fields["line_name"]]
+    station_states = fields["station_states"]
+    state_line = fields["state_line"]
+
+    state_line_id = fields["state_line_id"]
+    state_prev = fields["state_prev"]
+    state_next = fields["state_next"]
+    state_prev_distance = fields["state_prev_distance"]
+    state_next_distance = fields["state_next_distance"]
+    state_offset = fields["state_offset"]
+    station_name = fields["station_name"]
+    station_lat = fields["station_lat"]
+    station_lon = fields["station_lon"]
+
+    stations = {}
+    line_offsets = {name: {} for name in line_names}
+    for idx, station_id in enumerate(station_ids):
+        lines = []
+        for state in range(station_states[idx], station_states[idx + 1]):
+            line_name = line_names[state_line[state]]
+            lines.append(StationInLine(
+                station_id=station_id,
+                line_id=lookup(state_line_id[state]),
+                line_name=line_name,
+                prev_station_id=lookup(state_prev[state]),
+                next_station_id=lookup(state_next[state]),
+                prev_distance=_restore(state_prev_distance[state]),
+                next_distance=_restore(state_next_distance[state])
+            ))
+            if not math.isnan(state_offset[state]):
+                line_offsets[line_name][station_id] = state_offset[state]
+        stations[station_id] = Station(
+            name=strings[station_name[idx]],
+            id=station_id,
+            line=lines,
+            coords=(station_lat[idx], station_lon[idx])
+        )
+
+    neighbor_offsets = fields["line_neighbor_offsets"]
+    neighbor_target = fields["line_neighbor_target"]
+
+    # 与pickle相同，不经过__init__直接恢复各属性
+    graph = RouteGraph.__new__(RouteGraph)
+    graph.__dict__.update(
+        stations=stations,
+        version=version,
+        data_hash=data_hash,
+        route_table=None,
+        line_offsets=line_offsets,
+        line_lengths=dict(zip(line_names, fields["line_length"])),
+        loop_lines={name for name, loop in zip(line_names,
+                                               fields["line_loop"]) if loop},
+        station_ids=station_ids,
+        station_index={station_id: idx
+                       for idx, station_id in enumerate(station_ids)},
+        line_names=line_names,
+        line_index={name: idx for idx, name in enumerate(line_names)},
+        station_states=station_states,
+        state_station=fields["state_station"],
+        state_line=state_line,
+        edge_offsets=fields["edge_offsets"],
+        edge_target=fields["edge_target"],
+        edge_line=fields["edge_line"],
+        edge_length=fields["edge_length"],
+        line_neighbors=[
+            neighbor_target[neighbor_offsets[idx]:neighbor_offsets[idx + 1]]
+            for idx in range(num_lines)
+        ],
+    )
+    return graph
+
+
+def save_compiled_graph(graph, path=None):
+    """
+    将路线规划图写入编译图缓存文件（先写临时文件再替换）
+
+    Args:
+        graph: 路线规划图（需要带有data_hash）
+        path: 文件路径，默认为get_graph_cache_file()
+    """
+    write_atomic(path or get_graph_cache_file(), compile_graph(graph))
+
+
+def load_compiled_graph(data_hash, version=None, path=None):
+    """
+    从编译图缓存文件加载路线规划图
+
+    Args:
+        data_hash: 当前数据文件的SHA-256
+        version: 数据版本号
+        path: 文件路径，默认为get_graph_cache_file()
+
+    Returns:
+        RouteGraph: 路线规划图；文件不存在、格式不符或已过期时返回None
+    """
+    path = path or get_graph_cache_file()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return decompile_graph(data, data_hash, version)
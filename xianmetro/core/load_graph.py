@@ -5,21 +5,35 @@
 """
 
 import json
+import threading
+from array import array
+from collections import OrderedDict
+
 from xianmetro.station import Station, StationInLine
-from xianmetro.fetch import load_from_file
+from xianmetro.fetch import (
+    load_from_file, get_data_version, get_data_hash, get_current_city
+)
+from xianmetro.utils import haversine, get_city_graph_limit
+
+# 按城市缓存路线规划图的注册表，首次使用时按配置文件中的容量创建
+_graph_registry = None
 
 
-def parse_stations():
+def parse_stations(city=None):
     """
     解析地铁站点数据，构建站点字典
 
     从本地文件加载地铁数据，为每个站点创建Station对象，
-    处理换乘站（同一站点多条线路）的情况。
+    处理换乘站（同一站点多条线路）的情况。相邻站点间的距离优先使用
+    数据文件中预先计算的值，旧数据文件中没有时再临时计算。
+
+    Args:
+        city: 城市名称，默认为当前城市
 
     Returns:
         dict: 站点ID到Station对象的映射字典
     """
-    metro_data = load_from_file()
+    metro_data = load_from_file(city)
     station_dict = {}  # key: id, value: Station object
     # 换乘站临时存储（id: 不同线路的StationInLine列表）
     transfer_map = {}
@@ -48,12 +62,23 @@ def parse_stations():
             longitude = float(info['longitude'])
             line_id = info['line_id']
 
+            prev_distance = (
+                _next_distance(stations_data[prev_station_id], info)
+                if prev_station_id is not None else None
+            )
+            next_distance = (
+                _next_distance(info, stations_data[next_station_id])
+                if next_station_id is not None else None
+            )
+
             station_in_line = StationInLine(
                 station_id=station_id,
                 line_id=line_id,
                 line_name=line_name,
                 prev_station_id=prev_station_id,
-                next_station_id=next_station_id
+                next_station_id=next_station_id,
+                prev_distance=prev_distance,
+                next_distance=next_distance
             )
 
             if station_id not in station_dict:
@@ -74,6 +99,471 @@ def parse_stations():
     return station_dict
 
 
+def _next_distance(info, next_info):
+    """
+    获取线路上某站到下一站的距离
+
+    Args:
+        info: 当前站点的数据
+        next_info: 下一站点的数据
+
+    Returns:
+        float: 两站间距离（公里）
+    """
+    distance = info.get('next_distance')
+    if distance is None:
+        distance = haversine(
+            float(info['latitude']), float(info['longitude']),
+            float(next_info['latitude']), float(next_info['longitude'])
+        )
+    return distance
+
+
+class RouteGraph:
+    """
+    路线规划图类
+
+    由站点字典编译出的紧凑图结构，构建一次后可被多次路线规划复用，
+    避免每次规划都重新读取文件和构建邻接表。
+
+    站点、线路和搜索状态(站点, 线路)都使用从0开始的稠密整数编号，
+    邻接关系以CSR（压缩稀疏行）数组存储：站点i的边为
+    edge_offsets[i]到edge_offsets[i + 1]之间的下标，每条边记录目标状态、
+    所属线路和距离。搜索全程只在整数数组上进行，仅在接口边界处
+    才换回站点ID和线路名称。
+    """
+
+    def __init__(self, stations, version=None, data_hash=None):
+        """
+        初始化路线规划图
+
+        Args:
+            stations: 站点ID到Station对象的映射字典
+            version: 构建时的数据版本号，用于判断图是否过期
+            data_hash: 构建时数据文件的SHA-256（可选），用作跨进程的缓存键
+        """
+        self.stations = stations
+        self.version = version
+        self.data_hash = data_hash
+        self.route_table = None  # 预计算的全源路线表（可选）
+        # 线路名称 -> {站点ID: 距线路首站的累计距离}
+        self.line_offsets = {}
+        # 线路名称 -> 线路全长（环线包含首尾闭合段）
+        self.line_lengths = {}
+        self.loop_lines = set()  # 环线名称集合
+
+        # 站点与线路编号
+        self.station_ids = list(stations)
+        self.station_index = {
+            station_id: idx for idx, station_id in enumerate(self.station_ids)
+        }
+        self.line_names = []
+        self.line_index = {}
+        line_members = {}  # 线路名称 -> {站点ID: StationInLine}
+        for station_id, station_obj in stations.items():
+            for st_line in station_obj.line:
+                if st_line.line_name not in self.line_index:
+                    self.line_index[st_line.line_name] = len(self.line_names)
+                    self.line_names.append(st_line.line_name)
+                line_members.setdefault(
+                    st_line.line_name, {})[station_id] = st_line
+
+        # 状态编号：站点i的状态为station_states[i]到station_states[i + 1]
+        self.station_states = array('i', [0])
+        self.state_station = array('i')
+        self.state_line = array('i')
+        for idx, station_id in enumerate(self.station_ids):
+            for st_line in stations[station_id].line:
+                self.state_station.append(idx)
+                self.state_line.append(self.line_index[st_line.line_name])
+            self.station_states.append(len(self.state_station))
+
+        # CSR邻接数组
+        self.edge_offsets = array('i', [0])
+        self.edge_target = array('i')  # 目标状态（相邻站, 边所属线路）
+        self.edge_line = array('i')
+        self.edge_length = array('d')
+        for station_id in self.station_ids:
+            station_obj = stations[station_id]
+            for st_line in station_obj.line:
+                line_idx = self.line_index[st_line.line_name]
+                for neighbor_id, distance in (
+                        (st_line.prev_station_id, st_line.prev_distance),
+                        (st_line.next_station_id, st_line.next_distance)):
+                    if not neighbor_id or neighbor_id not in stations:
+                        continue
+                    self.edge_target.append(
+                        self._find_state(self.station_index[neighbor_id],
+                                         line_idx))
+                    self.edge_line.append(line_idx)
+                    self.edge_length.append(
+                        self._edge_distance(station_obj, neighbor_id,
+                                            distance))
+            self.edge_offsets.append(len(self.edge_target))
+
+        for line_name, members in line_members.items():
+            self._build_line_offsets(line_name, members)
+
+        # 线路换乘图：线路编号 -> 可在换乘站直接换乘的线路编号列表
+        line_neighbors = [set() for _ in self.line_names]
+        for idx in range(len(self.station_ids)):
+            lines = self.state_line[
+                self.station_states[idx]:self.station_states[idx + 1]]
+            for line_idx in lines:
+                line_neighbors[line_idx].update(
+                    other for other in lines if other != line_idx)
+        self.line_neighbors = [
+            array('i', sorted(neighbors)) for neighbors in line_neighbors
+        ]
+
+    @property
+    def num_states(self):
+        """状态总数"""
+        return len(self.state_station)
+
+    def _find_state(self, station_idx, line_idx):
+        """
+        查找站点在指定线路上的状态编号
+
+        Args:
+            station_idx: 站点编号
+            line_idx: 线路编号
+
+        Returns:
+            int: 状态编号，站点不在该线路上时返回-1
+        """
+        for state in range(self.station_states[station_idx],
+                           self.station_states[station_idx + 1]):
+            if self.state_line[state] == line_idx:
+                return state
+        return -1
+
+    def station_state(self, station_id, line_name):
+        """
+        将(站点ID, 线路名称)转换为状态编号
+
+        Args:
+            station_id: 站点ID
+            line_name: 线路名称
+
+        Returns:
+            int: 状态编号，不存在时返回-1
+        """
+        if station_id not in self.station_index or \
+                line_name not in self.line_index:
+            return -1
+        return self._find_state(self.station_index[station_id],
+                                self.line_index[line_name])
+
+    def state_pair(self, state):
+        """
+        将状态编号转换为(站点ID, 线路名称)
+
+        Args:
+            state: 状态编号
+
+        Returns:
+            tuple: (站点ID, 线路名称)
+        """
+        return (self.station_ids[self.state_station[state]],
+                self.line_names[self.state_line[state]])
+
+    def station_lines(self, station_id):
+        """
+        获取站点所属的全部线路名称
+
+        Args:
+            station_id: 站点ID
+
+        Returns:
+            list: 线路名称列表，站点不存在时为空列表
+        """
+        idx = self.station_index.get(station_id)
+        if idx is None:
+            return []
+        return [self.line_names[self.state_line[state]]
+                for state in range(self.station_states[idx],
+                                   self.station_states[idx + 1])]
+
+    def neighbors(self, station_id):
+        """
+        获取站点的全部相邻站
+
+        Args:
+            station_id: 站点ID
+
+        Returns:
+            list: [(相邻站ID, 线路名称, 距离), ...]
+        """
+        idx = self.station_index.get(station_id)
+        if idx is None:
+            return []
+        return [
+            (self.station_ids[self.state_station[self.edge_target[edge]]],
+             self.line_names[self.edge_line[edge]],
+             self.edge_length[edge])
+            for edge in range(self.edge_offsets[idx],
+                              self.edge_offsets[idx + 1])
+        ]
+
+    def line_transfers(self, line_name):
+        """
+        获取可从指定线路直接换乘的线路名称
+
+        Args:
+            line_name: 线路名称
+
+        Returns:
+            set: 线路名称集合
+        """
+        line_idx = self.line_index.get(line_name)
+        if line_idx is None:
+            return set()
+        return {self.line_names[other]
+                for other in self.line_neighbors[line_idx]}
+
+    def _edge_distance(self, station_obj, neighbor_id, distance):
+        """
+        获取边的距离，站点数据中没有预先计算的距离时用坐标计算
+
+        Args:
+            station_obj: 边的起点站
+            neighbor_id: 边的终点站ID
+            distance: 预先计算的距离（可能为None）
+
+        Returns:
+            float: 边的距离（公里）
+        """
+        if distance is not None:
+            return distance
+        lat1, lon1 = station_obj.coords
+        lat2, lon2 = self.stations[neighbor_id].coords
+        return haversine(lat1, lon1, lat2, lon2)
+
+    def _build_line_offsets(self, line_name, members):
+        """
+        沿线路顺序累计各站距首站的距离
+
+        Args:
+            line_name: 线路名称
+            members: 站点ID到该线路上StationInLine对象的映射
+        """
+        # 普通线路从没有前一站的首站开始，环线从任意一站开始
+        head = next(
+            (sid for sid, st_line in members.items()
+             if st_line.prev_station_id is None),
+            next(iter(members))
+        )
+        offsets = {}
+        total = 0.0
+        station_id = head
+        while True:
+            offsets[station_id] = total
+            st_line = members[station_id]
+            next_id = st_line.next_station_id
+            if next_id is None or next_id not in members:
+                break
+            total += self._edge_distance(self.stations[station_id],
+                                         next_id, st_line.next_distance)
+            if next_id in offsets:
+                # 回到已经过的站点，说明是环线
+                self.loop_lines.add(line_name)
+                break
+            station_id = next_id
+        self.line_offsets[line_name] = offsets
+        self.line_lengths[line_name] = total
+
+    def line_distance(self, line_name, from_station, to_station):
+        """
+        查询同一线路上两站之间的距离
+
+        Args:
+            line_name: 线路名称
+            from_station: 起始站ID
+            to_station: 目标站ID
+
+        Returns:
+            float: 两站沿线路的距离（公里），环线取较短方向；
+            任一站点不在该线路上则返回None
+        """
+        offsets = self.line_offsets.get(line_name, {})
+        if from_station not in offsets or to_station not in offsets:
+            return None
+        distance = abs(offsets[to_station] - offsets[from_station])
+        if line_name in self.loop_lines:
+            distance = min(distance, self.line_lengths[line_name] - distance)
+        return distance
+
+    def __getstate__(self):
+        """
+        序列化时不携带路线表（其中引用了文件缓冲区），
+        以便把图传给子进程
+        """
+        state = self.__dict__.copy()
+        state['route_table'] = None
+        return state
+
+    def edge_distance(self, from_station, to_station, line_name):
+        """
+        查询相邻两站之间沿指定线路的距离
+
+        Args:
+            from_station: 起始站ID
+            to_station: 相邻站ID
+            line_name: 线路名称
+
+        Returns:
+            float: 距离（公里），两站不相邻时返回None
+        """
+        for neighbor_id, neighbor_line, distance in self.neighbors(
+                from_station):
+            if neighbor_id == to_station and neighbor_line == line_name:
+                return distance
+        return None
+
+
+def _load_graph(city, version):
+    """
+    构建城市的路线规划图
+
+    优先从与数据哈希匹配的编译图缓存文件恢复，没有时才解析JSON构建
+    并写入缓存文件；若存在与数据匹配的全源路线表文件，也会一并加载。
+    路线表过期时不会在这里重建（耗时较长），需手动运行route_table模块。
+
+    Args:
+        city: 城市名称
+        version: 数据版本号
+
+    Returns:
+        RouteGraph: 路线规划图
+    """
+    from xianmetro.core.graph_cache import (
+        load_compiled_graph, save_compiled_graph, get_graph_cache_file
+    )
+    from xianmetro.core.route_table import (
+        load_route_table, get_route_table_file
+    )
+    data_hash = get_data_hash(city)
+    graph = (load_compiled_graph(data_hash, version,
+                                 get_graph_cache_file(city))
+             if data_hash else None)
+    if graph is None:
+        stations = parse_stations(city)  # 数据文件不存在时会先下载
+        graph = RouteGraph(stations, version, data_hash or get_data_hash(city))
+        try:
+            save_compiled_graph(graph, get_graph_cache_file(city))
+        except OSError:
+            pass  # 缓存文件只用于加速，写入失败不影响使用
+    graph.route_table = load_route_table(graph, get_route_table_file(city))
+    return graph
+
+
+class GraphRegistry:
+    """
+    城市路线规划图注册表
+
+    按城市保存最近使用的capacity个路线规划图，超出时淘汰最久未使用的城市。
+    切换回已在注册表中的城市只需一次字典查询；城市的数据版本变化
+    （save_to_file写入新数据）后，下次访问时重建该城市的图。
+    可以在后台线程中预先构建新数据的图。锁只保护注册表本身，
+    构建在锁外进行，构建一个城市的图时其他城市的访问不会被阻塞。
+    """
+
+    def __init__(self, capacity):
+        """
+        初始化注册表
+
+        Args:
+            capacity: 最多保存的城市数，至少为1
+        """
+        self.capacity = max(1, capacity)
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._graphs)
+
+    def __contains__(self, city):
+        return city in self._graphs
+
+    def cities(self):
+        """
+        获取注册表中的城市，按从最久未使用到最近使用排序
+
+        Returns:
+            list: 城市名称列表
+        """
+        return list(self._graphs)
+
+    def get(self, city):
+        """
+        获取城市的路线规划图，不存在或已过期时构建
+
+        Args:
+            city: 城市名称，None表示DATA_FILE对应的数据
+
+        Returns:
+            RouteGraph: 路线规划图
+        """
+        while True:
+            with self._lock:
+                version = get_data_version(city)
+                graph = self._graphs.get(city)
+                if graph is not None and graph.version == version:
+                    self._graphs.move_to_end(city)
+                    return graph
+            graph = _load_graph(city, version)
+            with self._lock:
+                if get_data_version(city) != version:
+                    continue  # 构建期间写入了新数据，按新数据重新构建
+                current = self._graphs.get(city)
+                if current is not None and current.version == version:
+                    graph = current  # 其他线程已构建好同一版本，沿用同一个图
+                self._graphs[city] = graph
+                self._graphs.move_to_end(city)
+                while len(self._graphs) > self.capacity:
+                    self._graphs.popitem(last=False)
+                return graph
+
+    def clear(self):
+        """清空注册表"""
+        with self._lock:
+            self._graphs.clear()
+
+
+def get_graph_registry():
+    """
+    获取默认的城市路线规划图注册表
+
+    容量取自config.yaml中cache.city_graphs的配置。
+
+    Returns:
+        GraphRegistry: 注册表
+    """
+    global _graph_registry
+    if _graph_registry is None:
+        _graph_registry = GraphRegistry(get_city_graph_limit())
+    return _graph_registry
+
+
+def get_route_graph(city=None):
+    """
+    获取城市数据对应的路线规划图
+
+    图只在首次调用或数据版本变化（save_to_file写入新数据）后重建，
+    其余情况下直接返回注册表中缓存的图。
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        RouteGraph: 路线规划图
+    """
+    if city is None:
+        city = get_current_city()
+    return get_graph_registry().get(city)
+
+
 def id_to_name(station_dict, station_id):
     """
     将站点ID转换为站点名称
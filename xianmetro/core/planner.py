@@ -2,22 +2,41 @@
 路径规划模块
 
 提供地铁路线规划功能，支持三种策略：最少换乘、最少站点、最短距离。
-使用基于优先队列的搜索算法来找到最优路径。
+使用基于二叉堆的Dijkstra搜索算法来找到最优路径。
 """
 
-from collections import defaultdict
-from heapq import heappush, heappop
+from collections import OrderedDict
 
-from xianmetro.core import parse_stations, id_to_name, name_to_id
-from xianmetro.utils import haversine
+from xianmetro.core import (
+    parse_stations, id_to_name, name_to_id, get_route_graph
+)
+from xianmetro.core.search import (
+    dijkstra_search, least_transfer_search, bidirectional_search,
+    astar_search, get_strategy_key, path_cost, to_pairs, reconstruct_path,
+    shortest_path_tree, reachable_within, pareto_search, k_shortest_paths,
+    least_transfer_count
+)
+from xianmetro.core.route_cache import get_route_cache
 
+# 可选的搜索引擎
+ENGINES = ("auto", "dijkstra", "bidirectional", "astar")
 
-def plan_route(start_station, end_station, strategy):
+# 最短路径树缓存的容量（按起点和策略计）
+PATH_TREE_CACHE_SIZE = 16
+
+# (数据版本, 起点站ID, 策略) -> ShortestPathTree，按最近使用排序
+_path_trees = OrderedDict()
+
+
+def plan_route(start_station, end_station, strategy, graph=None,
+               engine="auto", stats=None, use_cache=True):
     """
     规划地铁路线
 
-    根据指定策略计算从起点到终点的最优路线。算法使用优先队列搜索，
-    根据不同策略优化不同的目标（换乘次数、站点数或距离）。
+    根据指定策略计算从起点到终点的最优路线。算法使用基于二叉堆的
+    Dijkstra搜索，按策略对应的字典序代价优化不同的目标（换乘次数、站点数或距离）。
+    默认引擎在路线规划图上挂有全源路线表时直接查表，不再搜索；
+    默认引擎的结果还会存入按数据哈希区分的LRU缓存，重复查询直接返回。
 
     Args:
         start_station: 起始站ID
@@ -26,6 +45,17 @@ def plan_route(start_station, end_station, strategy):
             1 - 最少换乘优先
             2 - 最少站点优先
             3 - 最短距离优先
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+        engine: 搜索引擎
+            "auto" - 有路线表时查表，最少换乘用线路换乘图剪枝，
+                最短距离用A*，最少站点用Dijkstra
+            "dijkstra" - 单向Dijkstra搜索
+            "bidirectional" - 双向Dijkstra搜索
+            "astar" - 以大圆距离为启发函数的A*搜索
+        stats: 统计字典（可选），搜索后写入扩展的状态数"expanded"；
+            给出时不使用结果缓存
+        use_cache: 默认引擎是否使用结果缓存；起终点不重复的批量规划
+            应关闭，以免挤掉缓存中的交互查询结果
 
     Returns:
         dict: 包含路线信息的字典，格式为：
@@ -40,109 +70,411 @@ def plan_route(start_station, end_station, strategy):
         }
         如果未找到路径则返回None
     """
-    stations = parse_stations()
+    if graph is None:
+        graph = get_route_graph()
+
+    get_strategy_key(strategy)  # 校验策略编号
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    # 默认引擎的结果可以缓存；指定引擎或需要统计信息时总是重新搜索
+    cache = None
+    if (engine == "auto" and stats is None and use_cache
+            and graph.data_hash is not None):
+        cache = get_route_cache()
+        hit, result = cache.get(graph, start_station, end_station, strategy)
+        if hit:
+            return result
+
+    table = graph.route_table
+    if engine == "bidirectional":
+        found = bidirectional_search(graph, start_station, end_station,
+                                     strategy, stats=stats)
+    elif engine == "dijkstra":
+        found = dijkstra_search(graph, start_station, end_station, strategy,
+                                stats=stats)
+    elif engine == "astar":
+        found = astar_search(graph, start_station, end_station, strategy,
+                             stats=stats)
+    elif table is not None and table.has_strategy(strategy):
+        # 查预计算的路线表，耗时与路线长度成正比
+        path = table.lookup(start_station, end_station, strategy)
+        found = (None if path is None
+                 else (to_pairs(graph, path),) + path_cost(graph, path))
+    elif strategy == 1:
+        # 最少换乘先在线路换乘图上确定可用线路，再做站点级搜索
+        found = least_transfer_search(graph, start_station, end_station,
+                                      stats=stats)
+    elif strategy == 3:
+        # 最短距离用大圆距离作启发函数，扩展的状态更少
+        found = astar_search(graph, start_station, end_station, strategy,
+                             stats=stats)
+    else:
+        found = dijkstra_search(graph, start_station, end_station, strategy,
+                                stats=stats)
+    result = None  # 未找到路径
+    if found is not None:
+        path, _, total_stops, total_distance = found
+        result = _make_result(path, total_stops, total_distance)
+    if cache is not None:
+        cache.put(graph, start_station, end_station, strategy, result)
+    return result
+
+
+def _make_result(path, total_stops, total_distance):
+    """
+    将搜索得到的路径整理为路线结果
+
+    Args:
+        path: (站点ID, 线路名称)列表
+        total_stops: 总站点数
+        total_distance: 总距离（公里）
+
+    Returns:
+        dict: 路线结果，格式同plan_route的返回值
+    """
+    # 整理路线分段
+    route = []
+    temp = []
+    last_line = path[0][1]
+    for sid, lname in path:
+        if lname != last_line:
+            route.append({"line": last_line, "stations": temp})
+            temp = [sid]
+            last_line = lname
+        else:
+            temp.append(sid)
+    if temp:
+        route.append({"line": last_line, "stations": temp})
+
+    transfers = max(0, len(route) - 1)  # 换乘次数为分段数减一
+
+    return {
+        "route": route,
+        "total_stops": total_stops,
+        "total_distance": round(total_distance, 5),
+        "transfers": transfers
+    }
+
+
+class ShortestPathTree:
+    """
+    单源最短路径树类
+
+    一次搜索确定从起点出发、按指定策略到达每个站点的最优路线，
+    之后到任意终点的路线只需沿前驱回溯，耗时与路线长度成正比。
+    得到的路线与dijkstra引擎的plan_route结果一致。
+    """
+
+    def __init__(self, graph, start_station, strategy):
+        """
+        初始化并计算最短路径树
+
+        Args:
+            graph: 路线规划图
+            start_station: 起始站ID
+            strategy: 选择策略（1-3）
+        """
+        self.graph = graph
+        self.start_station = start_station
+        self.strategy = strategy
+        self.parents, self.labels, self.reached = shortest_path_tree(
+            graph, start_station, strategy)
+
+    def route_to(self, end_station):
+        """
+        获取到指定终点的路线
+
+        Args:
+            end_station: 目标站ID
+
+        Returns:
+            dict: 路线结果，格式同plan_route；不可达时返回None
+        """
+        idx = self.graph.station_index.get(end_station)
+        if idx is None or self.reached[idx] == -1:
+            return None
+        state = self.reached[idx]
+        _, total_stops, total_distance = self.labels[state]
+        path = to_pairs(self.graph, reconstruct_path(self.parents, state))
+        return _make_result(path, total_stops, total_distance)
+
+    def reachable_stations(self):
+        """
+        获取从起点可达的全部站点
+
+        Returns:
+            list: 站点ID列表
+        """
+        station_ids = self.graph.station_ids
+        return [station_ids[idx] for idx, state in enumerate(self.reached)
+                if state != -1]
+
+
+def get_path_tree(start_station, strategy, graph=None):
+    """
+    获取起点在指定策略下的最短路径树
+
+    最短路径树按(数据版本, 起点, 策略)缓存，只保留最近使用的
+    PATH_TREE_CACHE_SIZE棵；数据更新后旧的树不会再被命中。
+
+    Args:
+        start_station: 起始站ID
+        strategy: 选择策略（1-3）
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+
+    Returns:
+        ShortestPathTree: 最短路径树
+
+    Raises:
+        ValueError: 如果策略编号无效
+    """
+    if graph is None:
+        graph = get_route_graph()
+    get_strategy_key(strategy)  # 校验策略编号
+
+    key = (graph.version, start_station, strategy)
+    tree = _path_trees.get(key)
+    if tree is not None and tree.graph is graph:
+        _path_trees.move_to_end(key)
+        return tree
+
+    tree = ShortestPathTree(graph, start_station, strategy)
+    _path_trees[key] = tree
+    _path_trees.move_to_end(key)
+    while len(_path_trees) > PATH_TREE_CACHE_SIZE:
+        _path_trees.popitem(last=False)
+    return tree
+
+
+def plan_routes(start_station, end_station, strategies=(1, 2, 3), graph=None,
+                use_trees=False):
+    """
+    一次规划多种策略的路线
+
+    所有策略共用同一张路线规划图。最少站点策略会先于其他策略计算：
+    它不可达时其他策略也不可达；它的换乘次数若已等于线路换乘图上的
+    最少换乘次数，它同时也是最少换乘的最优解。这两种情况无需再次搜索，
+    其余情况下各策略仍分别规划（由路线结果缓存、路线表或最短路径树加速）。
+    内容完全相同的路线会返回同一个字典对象，调用方可以用 ``is`` 判断，
+    只格式化和绘制一次。
+
+    起点固定、终点频繁变化时（如界面中反复更换终点）可启用use_trees，
+    没有路线表时改从缓存的最短路径树中提取路线，同一起点只搜索一次。
+
+    Args:
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategies: 要规划的策略编号序列，默认为(1, 2, 3)
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+        use_trees: 是否使用缓存的最短路径树
+
+    Returns:
+        dict: 策略编号到路线结果（格式同plan_route）的映射，
+        按strategies的顺序排列；未找到路径的策略对应None
+    """
+    if graph is None:
+        graph = get_route_graph()
+
+    results = {}
+    unique_results = []  # 已得到的互不相同的路线
+    for strategy in sorted(strategies, key=lambda s: s != 2):
+        least_stops = results.get(2)
+        table = graph.route_table
+        if 2 in results and least_stops is None:
+            result = None  # 可达性与策略无关
+        elif (strategy == 1 and least_stops is not None
+                and least_stops["transfers"] == least_transfer_count(
+                    graph, start_station, end_station)):
+            result = least_stops
+        elif use_trees and not (table is not None
+                                and table.has_strategy(strategy)):
+            tree = get_path_tree(start_station, strategy, graph)
+            result = tree.route_to(end_station)
+        else:
+            result = plan_route(start_station, end_station, strategy, graph)
+
+        # 与已有路线内容相同时复用同一个对象
+        for existing in unique_results:
+            if result == existing:
+                result = existing
+                break
+        else:
+            if result is not None:
+                unique_results.append(result)
+        results[strategy] = result
 
-    # 构建邻接表，站点ID为节点，边为相邻站
-    adj = defaultdict(list)
-    line_map = defaultdict(list)  # 站点ID到其所有线路的映射
-
-    for station_id, station_obj in stations.items():
-        for st_line in station_obj.line:
-            line_map[station_id].append(st_line.line_name)
-            if st_line.prev_station_id:
-                adj[station_id].append(
-                    (st_line.prev_station_id, st_line.line_name)
-                )
-            if st_line.next_station_id:
-                adj[station_id].append(
-                    (st_line.next_station_id, st_line.line_name)
-                )
-
-    # 状态：(权重, 当前站ID, 当前线路, 路径列表, 已走距离, 换乘次数, 经过站点数)
-    queue = []
-    visited = dict()  # (station_id, line_name): 权重，防止回头/环线死循环
-
-    # 初始化起点入队 - 为每条可能的线路创建初始状态
-    for line_name in line_map[start_station]:
-        heappush(
-            queue,
-            (0, start_station, line_name, [(start_station, line_name)],
-             0.0, 0, 1)
+    return {strategy: results[strategy] for strategy in strategies}
+
+
+def plan_pareto_routes(start_station, end_station, graph=None):
+    """
+    规划起终点间的全部帕累托最优路线
+
+    一次多目标搜索得到换乘次数、站点数、距离三者之间互不支配的所有路线，
+    除三种策略各自的最优路线外，还包含它们之间的折中方案。
+    各策略的最优路线可用pick_strategy_routes从中选出，无需再次搜索。
+
+    Args:
+        start_station: 起始站ID
+        end_station: 目标站ID
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+
+    Returns:
+        list: 路线结果（格式同plan_route）列表，
+        按(换乘次数, 站点数, 距离)的字典序排列；不可达时为空列表
+    """
+    if graph is None:
+        graph = get_route_graph()
+    return [
+        _make_result(path, total_stops, total_distance)
+        for path, _, total_stops, total_distance
+        in pareto_search(graph, start_station, end_station)
+    ]
+
+
+def pick_strategy_routes(front, strategies=(1, 2, 3)):
+    """
+    从帕累托最优路线中选出各策略的最优路线
+
+    Args:
+        front: plan_pareto_routes返回的路线结果列表
+        strategies: 策略编号序列，默认为(1, 2, 3)
+
+    Returns:
+        dict: 策略编号到路线结果的映射，结果是front中的同一对象，
+        多个策略选中同一路线时可用 ``is`` 判断；front为空时对应None
+
+    Raises:
+        ValueError: 如果策略编号无效
+    """
+    picked = {}
+    for strategy in strategies:
+        make_key = get_strategy_key(strategy)
+        picked[strategy] = min(
+            front,
+            key=lambda result: make_key(result["transfers"],
+                                        result["total_stops"],
+                                        result["total_distance"]),
+            default=None
         )
+    return picked
+
+
+def plan_alternatives(start_station, end_station, strategy, k=3, graph=None):
+    """
+    规划按指定策略排在前k位的备选路线
+
+    第一条即为plan_route的最优路线，之后依次为代价次优的路线，
+    例如某条线路拥挤时可改选的其他走法。所乘线路、换乘站（同一换乘
+    枢纽视为同一站）和行进方向都相同的路线视为同一走法，只保留代价
+    最小的一条。
+
+    Args:
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+        k: 路线数量，默认为3
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
 
-    while queue:
-        # 根据策略排序
-        if strategy == 1:
-            # 换乘优先：首先按换乘次数，其次按站点数
-            queue.sort(key=lambda x: (x[5], x[6]))
-        elif strategy == 2:
-            # 站点数优先：首先按站点数，其次按换乘次数
-            queue.sort(key=lambda x: (x[6], x[5]))
-        elif strategy == 3:
-            # 距离优先：首先按距离，其次按换乘次数
-            queue.sort(key=lambda x: (x[4], x[5]))
-
-        item = queue.pop(0)
-        (_, curr_id, curr_line, path, curr_dist,
-         curr_transfer, curr_stops) = item
-
-        # 到达终点
-        if curr_id == end_station:
-            # 整理路线分段
-            route = []
-            temp = []
-            last_line = path[0][1]
-            for sid, lname in path:
-                if lname != last_line:
-                    route.append({"line": last_line, "stations": temp})
-                    temp = [sid]
-                    last_line = lname
-                else:
-                    temp.append(sid)
-            if temp:
-                route.append({"line": last_line, "stations": temp})
-
-            transfers = max(0, len(route) - 1)  # 换乘次数为分段数减一
-
-            return {
-                "route": route,
-                "total_stops": curr_stops,
-                "total_distance": round(curr_dist, 5),
-                "transfers": transfers
-            }
-
-        # 防止回头/死循环，记录最优权重
-        state_key = (curr_id, curr_line)
-        weight = (curr_transfer, curr_stops, curr_dist)
-        if state_key in visited:
-            # 如果已访问且当前权重不优则跳过
-            if visited[state_key] <= weight:
-                continue
-        visited[state_key] = weight
-
-        # 扩展邻居站点
-        for neighbor_id, neighbor_line in adj[curr_id]:
-            # 判断是否需要换乘
-            next_transfer = curr_transfer
-            if neighbor_line != curr_line:
-                next_transfer += 1
-
-            # 计算距离增量
-            lat1, lon1 = stations[curr_id].coords
-            lat2, lon2 = stations[neighbor_id].coords
-            d = haversine(lat1, lon1, lat2, lon2)
-
-            # 将新状态加入队列
-            heappush(
-                queue,
-                (0, neighbor_id, neighbor_line,
-                 path + [(neighbor_id, neighbor_line)],
-                 curr_dist + d,
-                 next_transfer,
-                 curr_stops + 1)
-            )
-
-    return None  # 未找到路径
+    Returns:
+        list: 路线结果（格式同plan_route）列表，按策略代价排列，
+        可能少于k条；不可达时为空列表
+
+    Raises:
+        ValueError: 如果策略编号无效
+    """
+    if graph is None:
+        graph = get_route_graph()
+    get_strategy_key(strategy)  # 校验策略编号
+    return [
+        _make_result(path, total_stops, total_distance)
+        for path, _, total_stops, total_distance
+        in k_shortest_paths(graph, start_station, end_station, strategy, k)
+    ]
+
+
+def plan_extra_routes(start_station, end_station, limit, graph=None):
+    """
+    规划三种策略最优路线之外的备选路线
+
+    先取帕累托最优路线中三种策略（plan_routes启用use_trees时的结果，
+    与界面的策略标签页一致）之外的折中路线；不足limit条时，用最少换乘的
+    次优路线补足，只补充所乘线路序列与已有路线都不同的走法。
+    帕累托搜索和次优路线搜索都较慢，结果存入路线结果缓存
+    （键含数据哈希），同一起终点再次规划时直接返回。
+
+    Args:
+        start_station: 起始站ID
+        end_station: 目标站ID
+        limit: 备选路线的最大数量
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+
+    Returns:
+        list: 路线结果（格式同plan_route）列表，最多limit条；
+        没有其他走法时为空列表
+    """
+    if graph is None:
+        graph = get_route_graph()
+    cache = None
+    if graph.data_hash is not None:
+        cache = get_route_cache()
+        hit, extra = cache.get(graph, start_station, end_station,
+                               ("extra", limit))
+        if hit:
+            return extra
+
+    results = list(plan_routes(start_station, end_station, (1, 2, 3), graph,
+                               use_trees=True).values())
+    extra = [
+        result for result in plan_pareto_routes(start_station, end_station,
+                                                graph)
+        if result not in results
+    ][:limit]
+    if len(extra) < limit:
+        shown = {
+            tuple(segment["line"] for segment in result["route"])
+            for result in results + extra if result
+        }
+        for result in plan_alternatives(start_station, end_station, 1,
+                                        limit + len(shown), graph):
+            lines = tuple(segment["line"] for segment in result["route"])
+            if lines not in shown:
+                shown.add(lines)
+                extra.append(result)
+            if len(extra) >= limit:
+                break
+
+    if cache is not None:
+        cache.put(graph, start_station, end_station, ("extra", limit), extra)
+    return extra
+
+
+def find_reachable(start_station, max_stops=None, max_transfers=None,
+                   max_distance=None, graph=None):
+    """
+    查询从起点出发在给定范围内可达的全部站点
+
+    用于服务范围分析，例如"10站以内且最多换乘1次能到哪些站"。
+    一次有界搜索即可得到全部结果，无需对每个站点分别规划路线。
+
+    Args:
+        start_station: 起始站ID
+        max_stops: 站点数上限（含起点，同plan_route的total_stops），
+            None表示不限
+        max_transfers: 换乘次数上限，None表示不限
+        max_distance: 距离上限（公里），None表示不限
+        graph: 路线规划图（可选），默认使用当前数据对应的缓存图
+
+    Returns:
+        dict: 可达站点ID到代价列表的映射，每项代价为
+        (换乘次数, 站点数, 距离)，列表中的代价互不支配；
+        起点不存在时返回空字典
+    """
+    if graph is None:
+        graph = get_route_graph()
+    return reachable_within(graph, start_station, max_stops, max_transfers,
+                            max_distance)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+"""
+路线结果缓存模块
+
+为plan_route提供有界的LRU缓存，键为(起点, 终点, 策略, 数据哈希)；
+plan_extra_routes的备选路线列表也以同样的方式缓存。
+缓存中保存的是不可变的元组形式，每次命中都重新生成路线字典，
+调用方修改返回值不会影响缓存内容。
+"""
+
+from collections import OrderedDict
+
+from xianmetro.utils import get_route_cache_size
+
+# 默认缓存实例，首次使用时按配置文件中的容量创建
+_route_cache = None
+
+
+def _freeze(result):
+    """
+    将路线结果转换为不可变的元组形式
+
+    Args:
+        result: 路线结果字典、None（未找到路径）或路线结果列表
+
+    Returns:
+        tuple: 不可变的路线结果，result为None时返回None；
+        result为列表时返回各路线的不可变形式组成的列表
+    """
+    if result is None:
+        return None
+    if isinstance(result, list):
+        return [_freeze(item) for item in result]
+    route = tuple((segment["line"], tuple(segment["stations"]))
+                  for segment in result["route"])
+    return (route, result["total_stops"], result["total_distance"],
+            result["transfers"])
+
+
+def _thaw(frozen):
+    """
+    由不可变的元组形式生成新的路线结果字典
+
+    Args:
+        frozen: _freeze的返回值
+
+    Returns:
+        dict: 路线结果字典（格式同plan_route），frozen为None时返回None；
+        frozen为列表时返回新生成的路线结果列表
+    """
+    if frozen is None:
+        return None
+    if isinstance(frozen, list):
+        return [_thaw(item) for item in frozen]
+    route, total_stops, total_distance, transfers = frozen
+    return {
+        "route": [{"line": line, "stations": list(stations)}
+                  for line, stations in route],
+        "total_stops": total_stops,
+        "total_distance": total_distance,
+        "transfers": transfers
+    }
+
+
+class RouteCache:
+    """
+    路线结果LRU缓存类
+
+    只保留最近使用的capacity条结果，并统计命中、未命中和淘汰次数。
+    键中含有数据哈希，数据更新后旧数据的结果不会再被命中，随后按LRU
+    淘汰；在注册表中保留的几个城市之间切换时，各城市的结果都继续有效。
+    """
+
+    def __init__(self, capacity):
+        """
+        初始化缓存
+
+        Args:
+            capacity: 最多保存的结果条数，为0时不缓存
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, graph, start_station, end_station, strategy):
+        """
+        查询缓存
+
+        Args:
+            graph: 当前使用的路线规划图
+            start_station: 起始站ID
+            end_station: 目标站ID
+            strategy: 策略编号
+
+        Returns:
+            tuple: (是否命中, 路线结果)；命中时路线结果为新生成的字典，
+            缓存的是"未找到路径"时为None
+        """
+        key = (start_station, end_station, strategy, graph.data_hash)
+        if key not in self._entries:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, _thaw(self._entries[key])
+
+    def put(self, graph, start_station, end_station, strategy, result):
+        """
+        写入缓存，超出容量时淘汰最久未使用的结果
+
+        Args:
+            graph: 当前使用的路线规划图
+            start_station: 起始站ID
+            end_station: 目标站ID
+            strategy: 策略编号
+            result: 路线结果字典，或None（未找到路径）
+        """
+        if self.capacity <= 0:
+            return
+        key = (start_station, end_station, strategy, graph.data_hash)
+        self._entries[key] = _freeze(result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存（统计计数保留）"""
+        self._entries.clear()
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 包含hits、misses、evictions、size、capacity的字典
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "capacity": self.capacity
+        }
+
+
+def get_route_cache():
+    """
+    获取默认的路线结果缓存
+
+    容量取自config.yaml中cache.route_results的配置。
+
+    Returns:
+        RouteCache: 路线结果缓存
+    """
+    global _route_cache
+    if _route_cache is None:
+        _route_cache = RouteCache(get_route_cache_size())
+    return _route_cache
@@ -0,0 +1,357 @@
+"""
+全源路线表模块
+
+预先为所有起终点对和三种策略计算最优路线，以前驱矩阵的形式保存到
+数据文件旁的二进制文件中。查询时只需沿前驱回溯，耗时与路线长度成正比。
+
+路线表需要手动构建：全源计算在数百个站点的网络上也要数秒，
+加载路线规划图时只会加载与数据哈希一致的路线表，不会自动重建。
+数据更新后可重新运行以下命令（没有路线表时plan_route照常搜索）：
+
+    python -m xianmetro.core.route_table
+
+文件格式（小端序）：
+    头部：魔数b"XMRT"、格式版本、数组类型码、数据文件的SHA-256、
+          站点数、状态数、策略数，随后是各策略编号（每个1字节）
+    正文：按策略、起点（站点编号）的顺序依次存放
+          前驱数组（状态数个元素，起点状态和未到达的状态为哨兵值）
+          终点状态数组（站点数个元素，不可达的站点为哨兵值）
+"""
+
+import array
+import os
+import struct
+import sys
+
+from xianmetro.fetch import get_data_file
+from xianmetro.utils.write_file import write_atomic
+from xianmetro.core.load_graph import get_route_graph
+from xianmetro.core.search import shortest_path_tree
+
+MAGIC = b"XMRT"
+FORMAT_VERSION = 1
+STRATEGIES = (1, 2, 3)
+
+# 魔数、格式版本、类型码、填充、哈希、站点数、状态数、策略数
+_HEADER = struct.Struct("<4sHcx32sIII")
+
+# 子进程中的路线规划图，由进程池初始化函数设置
+_worker_graph = None
+
+
+def get_route_table_file(city=None):
+    """
+    获取路线表文件路径（与数据文件同目录同名，扩展名为.routes）
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        str: 路线表文件路径
+    """
+    return os.path.splitext(get_data_file(city))[0] + ".routes"
+
+
+def _typecode_for(graph):
+    """
+    根据状态数选择能容纳编号和哨兵值的最小数组类型
+
+    Args:
+        graph: 路线规划图
+
+    Returns:
+        tuple: (类型码, 哨兵值)
+    """
+    if max(graph.num_states, len(graph.station_ids)) < 0xFFFF:
+        return "H", 0xFFFF
+    return "I", 0xFFFFFFFF
+
+
+class RouteTable:
+    """
+    全源路线表类
+
+    持有路线表文件内容的只读视图，按(起点, 终点, 策略)回溯出路径。
+    """
+
+    def __init__(self, graph, data, data_hash, strategies):
+        """
+        初始化路线表
+
+        Args:
+            graph: 构建路线表所用的路线规划图
+            data: 正文部分的字节数据
+            data_hash: 数据文件的SHA-256
+            strategies: 路线表包含的策略编号元组
+        """
+        self.graph = graph
+        self.data_hash = data_hash
+        self.strategies = tuple(strategies)
+        self.typecode, self._sentinel = _typecode_for(graph)
+        if sys.byteorder == "little":
+            self._values = memoryview(data).cast(self.typecode)
+        else:
+            self._values = array.array(self.typecode)
+            self._values.frombytes(data)
+            self._values.byteswap()
+        self._num_stations = len(graph.station_ids)
+        self._num_states = graph.num_states
+        self._block = self._num_states + self._num_stations
+
+    def has_strategy(self, strategy):
+        """
+        判断路线表是否包含指定策略
+
+        Args:
+            strategy: 策略编号
+
+        Returns:
+            bool: 是否包含
+        """
+        return strategy in self.strategies
+
+    def lookup(self, start_station, end_station, strategy):
+        """
+        查询路线
+
+        Args:
+            start_station: 起始站ID
+            end_station: 目标站ID
+            strategy: 策略编号
+
+        Returns:
+            list: 状态编号列表，不可达时返回None
+        """
+        station_index = self.graph.station_index
+        if start_station not in station_index or \
+                end_station not in station_index:
+            return None
+        origin = station_index[start_station]
+        strategy_idx = self.strategies.index(strategy)
+        base = (strategy_idx * self._num_stations + origin) * self._block
+
+        values = self._values
+        sentinel = self._sentinel
+        state = values[base + self._num_states + station_index[end_station]]
+        if state == sentinel:
+            return None
+        path = []
+        while state != sentinel:
+            path.append(state)
+            state = values[base + state]
+        path.reverse()
+        return path
+
+    def to_bytes(self):
+        """
+        序列化为路线表文件内容
+
+        Returns:
+            bytes: 文件内容
+        """
+        header = _HEADER.pack(
+            MAGIC, FORMAT_VERSION, self.typecode.encode("ascii"),
+            bytes.fromhex(self.data_hash), self._num_stations,
+            self._num_states, len(self.strategies)
+        )
+        if isinstance(self._values, memoryview):
+            body = self._values.tobytes()
+        else:
+            values = array.array(self.typecode, self._values)
+            values.byteswap()
+            body = values.tobytes()
+        return header + bytes(self.strategies) + body
+
+
+def _init_worker(graph):
+    """
+    进程池初始化函数：每个子进程只接收一次路线规划图
+
+    Args:
+        graph: 路线规划图
+    """
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _origin_blocks(origin, graph=None):
+    """
+    计算单个起点在各策略下的前驱数组和终点状态数组
+
+    Args:
+        origin: 起点站ID
+        graph: 路线规划图，默认使用子进程中的图
+
+    Returns:
+        list: 每个策略对应的一段字节数据
+    """
+    graph = graph or _worker_graph
+    typecode, sentinel = _typecode_for(graph)
+    blocks = []
+    for strategy in STRATEGIES:
+        parents, _, reached = shortest_path_tree(graph, origin, strategy)
+        pred = array.array(typecode, [
+            sentinel if parent == -1 else parent for parent in parents
+        ])
+        ends = array.array(typecode, [
+            sentinel if state == -1 else state for state in reached
+        ])
+        if sys.byteorder != "little":
+            pred.byteswap()
+            ends.byteswap()
+        blocks.append(pred.tobytes() + ends.tobytes())
+    return blocks
+
+
+def build_route_table(graph=None, workers=None):
+    """
+    构建全源路线表
+
+    每个起点独立计算，使用进程池在所有CPU核心上并行；
+    路线规划图只在子进程启动时传递一次。
+
+    Args:
+        graph: 路线规划图，默认使用当前数据对应的缓存图
+        workers: 进程数，默认为CPU核心数；为1时在当前进程中计算
+
+    Returns:
+        RouteTable: 路线表
+    """
+    if graph is None:
+        graph = get_route_graph()
+    origins = graph.station_ids
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(origins) < 2:
+        per_origin = [_origin_blocks(origin, graph) for origin in origins]
+    else:
+        # 进程池延迟导入，加载路线表时不需要它
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(origins) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(graph,)) as executor:
+            per_origin = list(executor.map(_origin_blocks, origins,
+                                           chunksize=chunksize))
+
+    body = b"".join(
+        blocks[strategy_idx]
+        for strategy_idx in range(len(STRATEGIES))
+        for blocks in per_origin
+    )
+    return RouteTable(graph, body, graph.data_hash, STRATEGIES)
+
+
+def save_route_table(table, path=None):
+    """
+    将路线表写入文件（先写临时文件再替换，避免留下不完整的文件）
+
+    Args:
+        table: 路线表
+        path: 文件路径，默认为get_route_table_file()
+    """
+    write_atomic(path or get_route_table_file(), table.to_bytes())
+
+
+def load_route_table(graph, path=None):
+    """
+    从文件加载路线表
+
+    文件记录的数据哈希、站点数或状态数与路线规划图不一致时视为过期。
+
+    Args:
+        graph: 当前数据对应的路线规划图
+        path: 文件路径，默认为get_route_table_file()
+
+    Returns:
+        RouteTable: 路线表；文件不存在、格式不符或已过期时返回None
+    """
+    path = path or get_route_table_file()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+
+    (magic, version, typecode, digest, num_stations, num_states,
+     num_strategies) = _HEADER.unpack_from(data)
+    offset = _HEADER.size + num_strategies
+    strategies = tuple(data[_HEADER.size:offset])
+    expected_typecode, _ = _typecode_for(graph)
+    itemsize = array.array(expected_typecode).itemsize
+    expected_size = (offset + len(strategies) * num_stations
+                     * (num_states + num_stations) * itemsize)
+    if (magic != MAGIC or version != FORMAT_VERSION
+            or typecode.decode("ascii") != expected_typecode
+            or num_stations != len(graph.station_ids)
+            or num_states != graph.num_states
+            or len(data) != expected_size
+            or digest.hex() != graph.data_hash):
+        return None
+    return RouteTable(graph, memoryview(data)[offset:], digest.hex(),
+                      strategies)
+
+
+def ensure_route_table(graph=None, workers=None, city=None):
+    """
+    确保城市数据有可用的路线表
+
+    文件中的路线表与数据哈希一致时直接加载，否则重新构建并保存。
+    得到的路线表会挂到路线规划图上，供plan_route查询。
+    该函数不会被自动调用，数据更新后需要手动运行本模块重建路线表。
+
+    Args:
+        graph: 路线规划图，默认使用该城市数据对应的缓存图
+        workers: 构建时使用的进程数，默认为CPU核心数
+        city: 城市名称，默认为当前城市；决定路线表文件的路径
+
+    Returns:
+        RouteTable: 路线表
+    """
+    if graph is None:
+        graph = get_route_graph(city)
+    path = get_route_table_file(city)
+    table = load_route_table(graph, path)
+    if table is None:
+        table = build_route_table(graph, workers)
+        save_route_table(table, path)
+    graph.route_table = table
+    return table
+
+
+def main(argv=None):
+    """
+    命令行入口：为城市构建（或确认已有）路线表
+
+    Args:
+        argv: 命令行参数列表，默认为sys.argv[1:]
+    """
+    import argparse
+    import time
+
+    from xianmetro.utils.load_config import get_default_city
+
+    parser = argparse.ArgumentParser(
+        prog="python -m xianmetro.core.route_table",
+        description="预先计算城市全部起终点的路线并保存为路线表")
+    parser.add_argument("city", nargs="?", default=None,
+                        help="城市名称，默认为配置文件中的默认城市")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="构建时使用的进程数，默认为CPU核心数")
+    args = parser.parse_args(argv)
+    city = args.city or get_default_city()
+
+    begin = time.perf_counter()
+    route_table = ensure_route_table(workers=args.workers, city=city)
+    print(
+        f"Route table ready: {get_route_table_file(city)} "
+        f"({len(route_table.graph.station_ids)} stations, "
+        f"{time.perf_counter() - begin:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
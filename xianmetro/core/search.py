@@ -0,0 +1,1077 @@
+"""
+搜索引擎模块
+
+提供基于二叉堆的最短路径搜索。搜索状态为(站点, 线路)，在路线规划图的
+整数编号和CSR数组上进行，按照策略对应的字典序代价元组出队，
+每个状态只会被确定一次。搜索结果在返回时才换回站点ID和线路名称。
+"""
+
+from collections import deque
+from heapq import heappush, heappop
+
+from xianmetro.utils import haversine
+
+# 策略对应的字典序代价：由 (换乘次数, 站点数, 距离) 生成排序键
+STRATEGY_KEYS = {
+    # 最少换乘：换乘次数 -> 站点数 -> 距离
+    1: lambda transfers, stops, distance: (transfers, stops, distance),
+    # 最少站点：站点数 -> 换乘次数 -> 距离
+    2: lambda transfers, stops, distance: (stops, transfers, distance),
+    # 最短距离：距离 -> 换乘次数 -> 站点数
+    3: lambda transfers, stops, distance: (distance, transfers, stops),
+}
+
+# A*启发函数的缩放系数，略小于1以吸收浮点误差
+HEURISTIC_SCALE = 1 - 1e-9
+
+
+def get_strategy_key(strategy):
+    """
+    获取策略对应的排序键函数
+
+    Args:
+        strategy: 策略编号（1-3）
+
+    Returns:
+        callable: 接收(换乘次数, 站点数, 距离)并返回排序元组的函数
+
+    Raises:
+        ValueError: 如果策略编号无效
+    """
+    try:
+        return STRATEGY_KEYS[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown strategy: {strategy}") from None
+
+
+def reconstruct_path(parents, state):
+    """
+    沿前驱指针回溯出完整的状态序列
+
+    Args:
+        parents: 状态编号到前驱状态编号的映射，起点状态的前驱为-1
+        state: 终点状态编号
+
+    Returns:
+        list: 从起点到终点的状态编号列表
+    """
+    path = []
+    while state != -1:
+        path.append(state)
+        state = parents[state]
+    path.reverse()
+    return path
+
+
+def to_pairs(graph, path):
+    """
+    将状态编号序列换回(站点ID, 线路名称)序列
+
+    Args:
+        graph: 路线规划图
+        path: 状态编号列表
+
+    Returns:
+        list: (站点ID, 线路名称)列表
+    """
+    return [graph.state_pair(state) for state in path]
+
+
+def path_cost(graph, path):
+    """
+    计算状态序列的换乘次数、站点数和距离
+
+    距离按路径顺序逐段累加，与搜索时的累加顺序一致。
+
+    Args:
+        graph: 路线规划图
+        path: 状态编号列表
+
+    Returns:
+        tuple: (换乘次数, 站点数, 距离)
+    """
+    state_station = graph.state_station
+    state_line = graph.state_line
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    transfers = 0
+    distance = 0.0
+    for prev, curr in zip(path, path[1:]):
+        if state_line[curr] != state_line[prev]:
+            transfers += 1
+        station = state_station[prev]
+        for edge in range(edge_offsets[station], edge_offsets[station + 1]):
+            if edge_target[edge] == curr:
+                distance += graph.edge_length[edge]
+                break
+    return transfers, len(path), distance
+
+
+def _station_states(graph, station_id):
+    """
+    获取站点的全部状态编号
+
+    Args:
+        graph: 路线规划图
+        station_id: 站点ID
+
+    Returns:
+        range: 状态编号范围，站点不存在时为空
+    """
+    idx = graph.station_index.get(station_id)
+    if idx is None:
+        return range(0)
+    return range(graph.station_states[idx], graph.station_states[idx + 1])
+
+
+def _dijkstra(graph, start_station, strategy, end_idx=-1, line_filter=None,
+              heuristic=None):
+    """
+    Dijkstra搜索的公共部分
+
+    队列按策略的字典序代价排序，状态首次出队即为最优，之后不再扩展；
+    相同代价的状态按入队顺序出队，保证结果稳定。给出终点时在终点的
+    第一个状态出队后停止，否则确定所有可达状态。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        strategy: 选择策略（1-3）
+        end_idx: 终点站编号，-1表示不提前停止
+        line_filter: 状态过滤函数（可选），接收(线路编号, 换乘次数)，
+            返回False的状态不会入队
+        heuristic: 启发函数（可选），接收站点编号，返回到终点剩余距离的
+            下界；给出时按A*方式把下界计入排序键的距离分量
+
+    Returns:
+        tuple: (parents, labels, reached, expanded)
+            - parents: 状态编号到前驱状态编号的列表，起点和未到达的状态为-1
+            - labels: 状态编号到(换乘次数, 站点数, 距离)的列表，未到达为None
+            - reached: 站点编号到其第一个被确定的状态编号的列表，
+              未确定为-1
+            - expanded: 扩展的状态数
+    """
+    make_key = get_strategy_key(strategy)
+    state_station = graph.state_station
+    state_line = graph.state_line
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    num_states = graph.num_states
+    queue = []
+    counter = 0  # 入队序号，代价相同时保持先进先出
+    best = [None] * num_states  # 已知最优排序键
+    labels = [None] * num_states  # 已知最优的(换乘次数, 站点数, 距离)
+    parents = [-1] * num_states  # 前驱状态
+    reached = [-1] * len(graph.station_ids)
+    settled = bytearray(num_states)  # 已确定最优代价的状态
+    expanded = 0
+
+    # 起点的每条线路都是一个初始状态
+    for state in _station_states(graph, start_station):
+        if line_filter is not None and not line_filter(state_line[state], 0):
+            continue
+        estimate = heuristic(state_station[state]) if heuristic else 0.0
+        key = make_key(0, 1, estimate)
+        best[state] = key
+        labels[state] = (0, 1, 0.0)
+        heappush(queue, (key, counter, state))
+        counter += 1
+
+    while queue:
+        _, _, state = heappop(queue)
+        if settled[state]:
+            continue
+        settled[state] = 1
+        expanded += 1
+
+        curr_station = state_station[state]
+        curr_line = state_line[state]
+        if reached[curr_station] == -1:
+            reached[curr_station] = state
+            if curr_station == end_idx:
+                break  # 到达终点
+        curr_transfer, curr_stops, curr_dist = labels[state]
+
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            next_state = edge_target[edge]
+            if settled[next_state]:
+                continue
+
+            # 判断是否需要换乘
+            next_transfer = curr_transfer
+            neighbor_line = edge_line[edge]
+            if neighbor_line != curr_line:
+                next_transfer += 1
+                if (line_filter is not None
+                        and not line_filter(neighbor_line, next_transfer)):
+                    continue
+
+            next_dist = curr_dist + edge_length[edge]
+            next_stops = curr_stops + 1
+
+            estimate = next_dist
+            if heuristic is not None:
+                estimate += heuristic(state_station[next_state])
+            key = make_key(next_transfer, next_stops, estimate)
+            known = best[next_state]
+            if known is not None and known <= key:
+                continue
+            best[next_state] = key
+            labels[next_state] = (next_transfer, next_stops, next_dist)
+            parents[next_state] = state
+
+            heappush(queue, (key, counter, next_state))
+            counter += 1
+
+    return parents, labels, reached, expanded
+
+
+def dijkstra_search(graph, start_station, end_station, strategy,
+                    line_filter=None, heuristic=None, stats=None):
+    """
+    基于优先队列的Dijkstra搜索
+
+    在终点的第一个状态被确定时停止。队列中只保存状态编号，
+    路径通过每个状态的前驱指针在到达终点后一次性回溯得到。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+        line_filter: 状态过滤函数（可选），接收(线路编号, 换乘次数)，
+            返回False的状态不会入队
+        heuristic: 启发函数（可选），接收站点编号，返回到终点剩余距离的
+            下界；给出时按A*方式把下界计入排序键的距离分量
+        stats: 统计字典（可选），搜索结束后写入扩展的状态数"expanded"
+
+    Returns:
+        tuple: (路径列表, 换乘次数, 站点数, 距离)，
+        路径列表的元素为(站点ID, 线路名称)；未找到路径则返回None
+    """
+    end_idx = graph.station_index.get(end_station, -1)
+    parents, labels, reached, expanded = _dijkstra(
+        graph, start_station, strategy, end_idx, line_filter, heuristic)
+    if stats is not None:
+        stats["expanded"] = expanded
+    if end_idx == -1 or reached[end_idx] == -1:
+        return None
+    state = reached[end_idx]
+    path = to_pairs(graph, reconstruct_path(parents, state))
+    return (path,) + labels[state]
+
+
+def astar_search(graph, start_station, end_station, strategy, stats=None):
+    """
+    A*搜索
+
+    以到终点的大圆距离作为剩余距离的下界。相邻站点间的距离同样是
+    大圆距离，由三角不等式可知该启发函数是一致的，因此结果与
+    Dijkstra相同，但最短距离策略下扩展的状态会少得多。其他策略中
+    距离只用于决胜，启发函数仍然正确，只是几乎不减少扩展。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+        stats: 统计字典（可选），搜索结束后写入扩展的状态数"expanded"
+
+    Returns:
+        tuple: 同dijkstra_search的返回值；未找到路径则返回None
+    """
+    if end_station not in graph.stations:
+        return None
+    end_lat, end_lon = graph.stations[end_station].coords
+    stations = graph.stations
+    station_ids = graph.station_ids
+    estimates = [None] * len(station_ids)  # 站点编号 -> 到终点的距离下界
+
+    def heuristic(station_idx):
+        estimate = estimates[station_idx]
+        if estimate is None:
+            lat, lon = stations[station_ids[station_idx]].coords
+            # 略微缩小下界，防止浮点误差破坏一致性
+            estimate = haversine(lat, lon, end_lat, end_lon) * HEURISTIC_SCALE
+            estimates[station_idx] = estimate
+        return estimate
+
+    return dijkstra_search(graph, start_station, end_station, strategy,
+                           heuristic=heuristic, stats=stats)
+
+
+def bidirectional_search(graph, start_station, end_station, strategy,
+                         stats=None):
+    """
+    双向Dijkstra搜索
+
+    同时从起点正向、从终点反向搜索，两侧在同一个(站点, 线路)状态上相遇。
+    正向代价为到达该状态的代价，反向代价为从该状态出发到达终点的代价
+    （含离开该状态时可能发生的换乘），二者逐项相加即为经过该状态的
+    完整路线代价。字典序与逐项加法相容，因此当两侧队首代价之和不小于
+    已知最优相遇代价时即可停止，结果与单向搜索同样最优。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+        stats: 统计字典（可选），搜索结束后写入扩展的状态数"expanded"
+
+    Returns:
+        tuple: 同dijkstra_search的返回值；未找到路径则返回None
+    """
+    make_key = get_strategy_key(strategy)
+    state_station = graph.state_station
+    state_line = graph.state_line
+    station_states = graph.station_states
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    # 两个方向各自的队列、已知最优代价、前驱（反向为后继）和已确定集合
+    num_states = graph.num_states
+    queues = ([], [])
+    labels = ([None] * num_states, [None] * num_states)
+    links = ([-1] * num_states, [-1] * num_states)
+    settled = (bytearray(num_states), bytearray(num_states))
+    counter = 0
+    expanded = 0
+    best = None  # (排序键, 相遇状态)
+
+    def add_label(side, state, label, link):
+        nonlocal counter, best
+        key = make_key(*label)
+        known = labels[side][state]
+        if known is not None and make_key(*known) <= key:
+            return
+        labels[side][state] = label
+        links[side][state] = link
+        heappush(queues[side], (key, counter, state))
+        counter += 1
+        other = labels[1 - side][state]
+        if other is not None:
+            total_key = make_key(label[0] + other[0], label[1] + other[1],
+                                 label[2] + other[2])
+            if best is None or total_key < best[0]:
+                best = (total_key, state)
+
+    for state in _station_states(graph, start_station):
+        add_label(0, state, (0, 1, 0.0), -1)
+    for state in _station_states(graph, end_station):
+        add_label(1, state, (0, 0, 0.0), -1)
+
+    while queues[0] and queues[1]:
+        # 队首代价之和不小于已知最优相遇代价时停止
+        if best is not None:
+            top = tuple(a + b for a, b in
+                        zip(queues[0][0][0], queues[1][0][0]))
+            if top >= best[0]:
+                break
+
+        # 扩展队列较小的一侧
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        _, _, state = heappop(queues[side])
+        if settled[side][state]:
+            continue
+        settled[side][state] = 1
+        expanded += 1
+
+        curr_station = state_station[state]
+        curr_line = state_line[state]
+        curr_transfer, curr_stops, curr_dist = labels[side][state]
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            target = edge_target[edge]
+            if side == 0:
+                # 正向：沿边到达(相邻站, 边所属线路)
+                if settled[0][target]:
+                    continue
+                transfer = curr_transfer + (edge_line[edge] != curr_line)
+                add_label(0, target,
+                          (transfer, curr_stops + 1,
+                           curr_dist + edge_length[edge]),
+                          state)
+            elif edge_line[edge] == curr_line:
+                # 反向：沿当前线路的边回到相邻站，在相邻站可乘任意线路
+                neighbor = state_station[target]
+                for prev_state in range(station_states[neighbor],
+                                        station_states[neighbor + 1]):
+                    if settled[1][prev_state]:
+                        continue
+                    transfer = curr_transfer + (
+                        state_line[prev_state] != curr_line)
+                    add_label(1, prev_state,
+                              (transfer, curr_stops + 1,
+                               curr_dist + edge_length[edge]),
+                              state)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    if best is None:
+        return None
+
+    meet = best[1]
+    path = reconstruct_path(links[0], meet)
+    state = links[1][meet]
+    while state != -1:
+        path.append(state)
+        state = links[1][state]
+    return (to_pairs(graph, path),) + path_cost(graph, path)
+
+
+def shortest_path_tree(graph, start_station, strategy):
+    """
+    单源最短路径树搜索
+
+    与dijkstra_search使用同一个搜索过程，但不在终点停止，而是确定所有
+    可达状态。每个站点记录其第一个被确定的状态，这正是以该站为终点时
+    dijkstra_search会返回的状态。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        strategy: 选择策略（1-3）
+
+    Returns:
+        tuple: (parents, labels, reached)
+            - parents: 状态编号到前驱状态编号的列表，起点和未到达的状态为-1
+            - labels: 状态编号到(换乘次数, 站点数, 距离)的列表，未到达为None
+            - reached: 站点编号到其最优状态编号的列表，不可达为-1
+    """
+    parents, labels, reached, _ = _dijkstra(graph, start_station, strategy)
+    return parents, labels, reached
+
+
+def line_distances(graph, source_lines):
+    """
+    在线路换乘图上做多源广度优先搜索
+
+    Args:
+        graph: 路线规划图
+        source_lines: 起始线路编号列表，距离为0
+
+    Returns:
+        list: 线路编号到最少换乘次数的列表，不可达的线路为-1
+    """
+    distances = [-1] * len(graph.line_names)
+    queue = deque()
+    for line_idx in source_lines:
+        if distances[line_idx] == -1:
+            distances[line_idx] = 0
+            queue.append(line_idx)
+    while queue:
+        line_idx = queue.popleft()
+        for other in graph.line_neighbors[line_idx]:
+            if distances[other] == -1:
+                distances[other] = distances[line_idx] + 1
+                queue.append(other)
+    return distances
+
+
+def least_transfer_count(graph, start_station, end_station):
+    """
+    在线路换乘图上求起终点间的最少换乘次数
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+
+    Returns:
+        int: 最少换乘次数，不可达时返回None
+    """
+    state_line = graph.state_line
+    end_lines = [state_line[state]
+                 for state in _station_states(graph, end_station)]
+    from_start = line_distances(graph, [
+        state_line[state] for state in _station_states(graph, start_station)
+    ])
+    return min((from_start[line_idx] for line_idx in end_lines
+                if from_start[line_idx] != -1), default=None)
+
+
+def least_transfer_search(graph, start_station, end_station, stats=None):
+    """
+    最少换乘搜索
+
+    先在线路换乘图上求出最少换乘次数T，以及每条线路距起点线路和
+    终点线路的换乘次数；只有第k次换乘后所乘线路恰好满足
+    "距起点k次、距终点T-k次"时，才可能出现在最少换乘路线上。
+    随后只在这些线路上做站点级搜索，以站点数和距离决出最优路线。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        stats: 统计字典（可选），搜索结束后写入扩展的状态数"expanded"
+
+    Returns:
+        tuple: 同dijkstra_search的返回值；未找到路径则返回None
+    """
+    state_line = graph.state_line
+    start_lines = [state_line[state]
+                   for state in _station_states(graph, start_station)]
+    end_lines = [state_line[state]
+                 for state in _station_states(graph, end_station)]
+    from_start = line_distances(graph, start_lines)
+    to_end = line_distances(graph, end_lines)
+    reachable = [from_start[line_idx] for line_idx in end_lines
+                 if from_start[line_idx] != -1]
+    if not reachable:
+        if stats is not None:
+            stats["expanded"] = 0
+        return None
+    least_transfers = min(reachable)
+
+    def on_optimal_line_path(line_idx, transfers):
+        return (from_start[line_idx] == transfers
+                and to_end[line_idx] != -1
+                and transfers + to_end[line_idx] == least_transfers)
+
+    return dijkstra_search(graph, start_station, end_station, 1,
+                           line_filter=on_optimal_line_path, stats=stats)
+
+
+def _dominated(front, label):
+    """
+    判断代价是否被已有代价集合中的某一项支配（各项均不大于）
+
+    Args:
+        front: 代价元组列表
+        label: 待判断的代价元组
+
+    Returns:
+        bool: 是否被支配
+    """
+    transfers, stops, distance = label
+    return any(t <= transfers and s <= stops and d <= distance
+               for t, s, d in front)
+
+
+def reachable_within(graph, start_station, max_stops=None, max_transfers=None,
+                     max_distance=None):
+    """
+    有界多目标可达性搜索
+
+    以(换乘次数, 站点数, 距离)为代价做多目标标号搜索：每个状态保留
+    互不支配的全部代价，超出任一上限的标号直接丢弃，因此搜索范围只限于
+    上限以内的区域。标号按字典序出队，后出队的标号不可能支配先出队的，
+    出队时未被支配即可确定。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        max_stops: 站点数上限（含起点，同plan_route的total_stops），
+            None表示不限
+        max_transfers: 换乘次数上限，None表示不限
+        max_distance: 距离上限（公里），None表示不限
+
+    Returns:
+        dict: 可达站点ID到其互不支配的(换乘次数, 站点数, 距离)列表的映射，
+        列表按字典序排列；起点本身也包含在内
+    """
+    inf = float("inf")
+    stop_limit = inf if max_stops is None else max_stops
+    transfer_limit = inf if max_transfers is None else max_transfers
+    distance_limit = inf if max_distance is None else max_distance
+
+    state_station = graph.state_station
+    state_line = graph.state_line
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    fronts = [None] * graph.num_states  # 状态 -> 已确定的互不支配代价
+    queue = []
+    if stop_limit >= 1:
+        for state in _station_states(graph, start_station):
+            heappush(queue, ((0, 1, 0.0), state))
+
+    while queue:
+        label, state = heappop(queue)
+        front = fronts[state]
+        if front is None:
+            front = fronts[state] = []
+        elif _dominated(front, label):
+            continue
+        front.append(label)
+
+        curr_transfer, curr_stops, curr_dist = label
+        curr_station = state_station[state]
+        curr_line = state_line[state]
+        next_stops = curr_stops + 1
+        if next_stops > stop_limit:
+            continue
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            next_transfer = curr_transfer + (edge_line[edge] != curr_line)
+            next_dist = curr_dist + edge_length[edge]
+            if next_transfer > transfer_limit or next_dist > distance_limit:
+                continue
+            next_label = (next_transfer, next_stops, next_dist)
+            next_state = edge_target[edge]
+            if fronts[next_state] is not None and \
+                    _dominated(fronts[next_state], next_label):
+                continue
+            heappush(queue, (next_label, next_state))
+
+    # 合并同一站点各线路状态的代价，只保留互不支配的部分
+    reachable = {}
+    for idx, station_id in enumerate(graph.station_ids):
+        labels = []
+        for state in range(graph.station_states[idx],
+                           graph.station_states[idx + 1]):
+            if fronts[state] is not None:
+                labels.extend(fronts[state])
+        if not labels:
+            continue
+        labels.sort()
+        station_front = []
+        for label in labels:
+            if not _dominated(station_front, label):
+                station_front.append(label)
+        reachable[station_id] = station_front
+    return reachable
+
+
+def _station_hops(graph, end_idx):
+    """
+    在站点图上从终点做广度优先搜索，求各站到终点的最少站数
+
+    线路上的相邻关系是双向的，因此从终点出发的跳数即为到终点的跳数。
+
+    Args:
+        graph: 路线规划图
+        end_idx: 终点站编号，-1表示终点不存在
+
+    Returns:
+        list: 站点编号到跳数的列表，不可达为-1
+    """
+    hops = [-1] * len(graph.station_ids)
+    if end_idx == -1:
+        return hops
+    state_station = graph.state_station
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    hops[end_idx] = 0
+    queue = deque([end_idx])
+    while queue:
+        station = queue.popleft()
+        for edge in range(edge_offsets[station], edge_offsets[station + 1]):
+            neighbor = state_station[edge_target[edge]]
+            if hops[neighbor] == -1:
+                hops[neighbor] = hops[station] + 1
+                queue.append(neighbor)
+    return hops
+
+
+def pareto_search(graph, start_station, end_station, stats=None):
+    """
+    多目标标号搜索
+
+    一次搜索求出起终点间(换乘次数, 站点数, 距离)的全部帕累托最优路线。
+    每个状态只保留互不支配的标号；标号的代价加上到终点剩余代价的下界
+    （线路换乘图上的换乘次数、站点图上的跳数、大圆距离）后若已被终点
+    已有代价支配，也会被剪掉，因此标号集合通常很小。
+    三种策略的最优路线都在结果之中。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        stats: 统计字典（可选），搜索结束后写入扩展的标号数"expanded"
+
+    Returns:
+        list: 互不支配的(路径列表, 换乘次数, 站点数, 距离)列表，
+        按(换乘次数, 站点数, 距离)的字典序排列；不可达时为空列表
+    """
+    end_idx = graph.station_index.get(end_station, -1)
+    state_station = graph.state_station
+    state_line = graph.state_line
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    # 到终点剩余代价的下界：换乘次数按线路，站点数和距离按站点
+    to_end_lines = line_distances(graph, [
+        state_line[state] for state in _station_states(graph, end_station)
+    ])
+    hops = _station_hops(graph, end_idx)
+    estimates = [None] * len(graph.station_ids)
+    if end_idx != -1:
+        stations = graph.stations
+        station_ids = graph.station_ids
+        end_lat, end_lon = stations[end_station].coords
+
+    def lower_bound(state, cost):
+        station = state_station[state]
+        transfers_left = to_end_lines[state_line[state]]
+        if transfers_left == -1 or hops[station] == -1:
+            return None
+        estimate = estimates[station]
+        if estimate is None:
+            lat, lon = stations[station_ids[station]].coords
+            estimate = haversine(lat, lon, end_lat, end_lon) * HEURISTIC_SCALE
+            estimates[station] = estimate
+        return (cost[0] + transfers_left, cost[1] + hops[station],
+                cost[2] + estimate)
+
+    # 标号以编号引用，分别记录所在状态和前驱标号
+    label_state = []
+    label_parent = []
+    fronts = [None] * graph.num_states  # 状态 -> 已确定的互不支配代价
+    target_front = []  # 终点已确定的代价
+    target_labels = []
+    queue = []
+    expanded = 0
+
+    for state in _station_states(graph, start_station):
+        if lower_bound(state, (0, 1, 0.0)) is None:
+            continue
+        heappush(queue, ((0, 1, 0.0), len(label_state)))
+        label_state.append(state)
+        label_parent.append(-1)
+
+    while queue:
+        cost, label = heappop(queue)
+        state = label_state[label]
+        if target_front and _dominated(target_front,
+                                       lower_bound(state, cost)):
+            continue
+        front = fronts[state]
+        if front is None:
+            front = fronts[state] = []
+        elif _dominated(front, cost):
+            continue
+        front.append(cost)
+        expanded += 1
+
+        curr_station = state_station[state]
+        if curr_station == end_idx:
+            # 到达终点后继续前进只会绕回终点，不必扩展
+            target_front.append(cost)
+            target_labels.append(label)
+            continue
+
+        curr_transfer, curr_stops, curr_dist = cost
+        curr_line = state_line[state]
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            next_state = edge_target[edge]
+            next_cost = (curr_transfer + (edge_line[edge] != curr_line),
+                         curr_stops + 1, curr_dist + edge_length[edge])
+            bound = lower_bound(next_state, next_cost)
+            if bound is None or _dominated(target_front, bound) or (
+                    fronts[next_state] is not None
+                    and _dominated(fronts[next_state], next_cost)):
+                continue
+            heappush(queue, (next_cost, len(label_state)))
+            label_state.append(next_state)
+            label_parent.append(label)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+
+    routes = []
+    for cost, label in zip(target_front, target_labels):
+        path = []
+        while label != -1:
+            path.append(label_state[label])
+            label = label_parent[label]
+        path.reverse()
+        routes.append((to_pairs(graph, path),) + cost)
+    return routes
+
+
+def reverse_path_tree(graph, end_station, strategy):
+    """
+    以终点为根的反向最短路径树搜索
+
+    求出每个状态到终点的最优剩余代价（含离开该状态时可能发生的换乘）
+    及沿最优路线的下一个状态。反向扩展方式与bidirectional_search的
+    反向一侧相同。
+
+    Args:
+        graph: 路线规划图
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+
+    Returns:
+        tuple: (successors, labels)
+            - successors: 状态编号到下一个状态编号的列表，
+              终点状态和无法到达终点的状态为-1
+            - labels: 状态编号到剩余(换乘次数, 站点数, 距离)的列表，
+              无法到达终点为None
+    """
+    make_key = get_strategy_key(strategy)
+    state_station = graph.state_station
+    state_line = graph.state_line
+    station_states = graph.station_states
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    num_states = graph.num_states
+    queue = []
+    counter = 0
+    best = [None] * num_states
+    labels = [None] * num_states
+    successors = [-1] * num_states
+    settled = bytearray(num_states)
+
+    for state in _station_states(graph, end_station):
+        key = make_key(0, 0, 0.0)
+        best[state] = key
+        labels[state] = (0, 0, 0.0)
+        heappush(queue, (key, counter, state))
+        counter += 1
+
+    while queue:
+        _, _, state = heappop(queue)
+        if settled[state]:
+            continue
+        settled[state] = 1
+
+        curr_station = state_station[state]
+        curr_line = state_line[state]
+        curr_transfer, curr_stops, curr_dist = labels[state]
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            if edge_line[edge] != curr_line:
+                continue
+            # 沿当前线路的边回到相邻站，在相邻站可乘任意线路
+            neighbor = state_station[edge_target[edge]]
+            for prev_state in range(station_states[neighbor],
+                                    station_states[neighbor + 1]):
+                if settled[prev_state]:
+                    continue
+                label = (curr_transfer + (state_line[prev_state] != curr_line),
+                         curr_stops + 1, curr_dist + edge_length[edge])
+                key = make_key(*label)
+                known = best[prev_state]
+                if known is not None and known <= key:
+                    continue
+                best[prev_state] = key
+                labels[prev_state] = label
+                successors[prev_state] = state
+                heappush(queue, (key, counter, prev_state))
+                counter += 1
+
+    return successors, labels
+
+
+def _spur_path(graph, spur_state, end_idx, make_key, successors, to_go,
+               blocked, removed, same_line_first):
+    """
+    求从偏离状态到终点、避开指定站点和边的最优路径
+
+    反向最短路径树给出的剩余代价在删去站点和边后仍是下界，且满足一致性，
+    因此可作为A*的启发函数；若树上的路径本身未受影响则直接复用，不必搜索。
+
+    Args:
+        graph: 路线规划图
+        spur_state: 偏离状态编号
+        end_idx: 终点站编号
+        make_key: 策略排序键函数
+        successors: 反向最短路径树的下一状态列表
+        to_go: 反向最短路径树的剩余代价列表
+        blocked: 不可经过的站点编号集合（含偏离状态所在站）
+        removed: 偏离状态不可走向的下一状态集合
+        same_line_first: 是否要求第一段沿偏离状态所在线路前进
+
+    Returns:
+        list: 从偏离状态到终点的状态编号列表，不存在时返回None
+    """
+    state_station = graph.state_station
+    state_line = graph.state_line
+
+    # 复用树上的路径
+    path = [spur_state]
+    state = successors[spur_state]
+    while state != -1 and state_station[state] not in blocked:
+        path.append(state)
+        state = successors[state]
+    if (state == -1 and len(path) > 1
+            and state_station[path[-1]] == end_idx
+            and path[1] not in removed
+            and not (same_line_first
+                     and state_line[path[1]] != state_line[spur_state])):
+        return path
+
+    edge_offsets = graph.edge_offsets
+    edge_target = graph.edge_target
+    edge_line = graph.edge_line
+    edge_length = graph.edge_length
+
+    queue = []
+    counter = 0
+    best = {}
+    labels = {spur_state: (0, 0, 0.0)}
+    parents = {spur_state: -1}
+    settled = set()
+    if to_go[spur_state] is not None:
+        heappush(queue, (make_key(*to_go[spur_state]), counter, spur_state))
+        counter += 1
+
+    while queue:
+        _, _, state = heappop(queue)
+        if state in settled:
+            continue
+        settled.add(state)
+        curr_station = state_station[state]
+        if curr_station == end_idx:
+            return reconstruct_path(parents, state)
+
+        curr_line = state_line[state]
+        curr_transfer, curr_stops, curr_dist = labels[state]
+        for edge in range(edge_offsets[curr_station],
+                          edge_offsets[curr_station + 1]):
+            next_state = edge_target[edge]
+            if (next_state in settled or to_go[next_state] is None
+                    or state_station[next_state] in blocked):
+                continue
+            if state == spur_state and (
+                    next_state in removed
+                    or (same_line_first and edge_line[edge] != curr_line)):
+                continue
+            label = (curr_transfer + (edge_line[edge] != curr_line),
+                     curr_stops + 1, curr_dist + edge_length[edge])
+            remaining = to_go[next_state]
+            key = make_key(label[0] + remaining[0], label[1] + remaining[1],
+                           label[2] + remaining[2])
+            known = best.get(next_state)
+            if known is not None and known <= key:
+                continue
+            best[next_state] = key
+            labels[next_state] = label
+            parents[next_state] = state
+            heappush(queue, (key, counter, next_state))
+            counter += 1
+    return None
+
+
+def _route_signature(graph, path):
+    """
+    获取路线的走法标识
+
+    每段记录所乘线路、上车（换乘）站和上车后到达的第一站（即行进方向）。
+    站点按名称比较，同一换乘枢纽中ID不同的站点视为同一站。
+
+    Args:
+        graph: 路线规划图
+        path: 状态编号序列
+
+    Returns:
+        tuple: ((线路编号, 上车站名称, 下一站名称), ...)
+    """
+    state_station = graph.state_station
+    state_line = graph.state_line
+    stations = graph.stations
+    station_ids = graph.station_ids
+
+    def name(state):
+        return stations[station_ids[state_station[state]]].name
+
+    return tuple(
+        (state_line[path[i]], name(path[i - 1]), name(path[i]))
+        for i in range(1, len(path))
+        if i == 1 or state_line[path[i]] != state_line[path[i - 1]]
+    )
+
+
+def k_shortest_paths(graph, start_station, end_station, strategy, k,
+                     max_candidates=None):
+    """
+    按策略代价依次求出前k条无环路线（Yen偏离算法）
+
+    每条已接受路线的每个前缀都作为偏离点，删去已接受路线在该前缀后的
+    下一步并禁止回到前缀中的站点，求出偏离后的最优路径作为候选。
+    偏离路径通过以终点为根的反向最短路径树求解：整个过程只构建一次该树，
+    树上路径未受影响时直接复用，否则以树上的剩余代价作为A*启发函数。
+
+    所乘线路、换乘站和行进方向都相同，仅在同一换乘枢纽中使用了不同ID的
+    站点的路线视为重复，只保留代价最小者；经不同换乘站或沿环线不同方向
+    的路线都会保留。在起点立即换乘的路线没有意义，不会出现在结果中。
+
+    Args:
+        graph: 路线规划图
+        start_station: 起始站ID
+        end_station: 目标站ID
+        strategy: 选择策略（1-3）
+        k: 需要的路线数量
+        max_candidates: 最多接受的路线数（含重复路线），默认为k的20倍，
+            用于限制重复路线很多时的搜索量
+
+    Returns:
+        list: (路径列表, 换乘次数, 站点数, 距离)列表，按策略代价排列，
+        最多k条
+    """
+    make_key = get_strategy_key(strategy)
+    end_idx = graph.station_index.get(end_station, -1)
+    if k <= 0 or end_idx == -1:
+        return []
+    if max_candidates is None:
+        max_candidates = k * 20
+    state_station = graph.state_station
+    state_line = graph.state_line
+    successors, to_go = reverse_path_tree(graph, end_station, strategy)
+
+    candidates = []  # (排序键, 序号, 路径)
+    seen = set()
+    counter = 0
+
+    def add_candidate(path):
+        nonlocal counter
+        path = tuple(path)
+        if path in seen:
+            return
+        seen.add(path)
+        key = make_key(*path_cost(graph, path))
+        heappush(candidates, (key, counter, path))
+        counter += 1
+
+    # 每个起点状态沿所在线路出发的最优路线
+    for state in _station_states(graph, start_station):
+        if state_station[state] == end_idx:
+            add_candidate([state])
+            continue
+        if to_go[state] is None:
+            continue
+        spur = _spur_path(graph, state, end_idx, make_key, successors, to_go,
+                          {state_station[state]}, (), True)
+        if spur is not None:
+            add_candidate(spur)
+
+    accepted = []
+    results = []
+    signatures = set()
+    while candidates and len(results) < k and len(accepted) < max_candidates:
+        _, _, path = heappop(candidates)
+        accepted.append(path)
+
+        signature = _route_signature(graph, path)
+        if signature not in signatures:
+            signatures.add(signature)
+            results.append(path)
+
+        for i in range(len(path) - 1):
+            root = path[:i + 1]
+            removed = {other[i + 1] for other in accepted
+                       if len(other) > i + 1 and other[:i + 1] == root}
+            blocked = {state_station[state] for state in root}
+            spur = _spur_path(graph, path[i], end_idx, make_key, successors,
+                              to_go, blocked, removed, i == 0)
+            if spur is not None:
+                add_candidate(root[:-1] + tuple(spur))
+
+    return [(to_pairs(graph, path),) + path_cost(graph, path)
+            for path in results]
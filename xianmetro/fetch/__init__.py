@@ -5,10 +5,24 @@ __description__ = "数据获取模块，从高德地图API获取地铁站点信
 
 from .fetch_data import (
     get_metro_info,
+    fetch_metro_info,
+    update_metro_info,
+    create_session,
+    get_session,
+    close_session,
     parse_metro_info,
     save_to_file,
     load_from_file,
+    set_current_city,
+    get_current_city,
+    has_data_file,
+    get_data_version,
+    get_data_file,
+    get_data_hash,
+    MetroDataset,
+    get_dataset,
     get_id_list,
     get_station_list,
     get_line_color,
 )
+from .refresh import refresh_cities
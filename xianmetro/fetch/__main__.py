@@ -0,0 +1,9 @@
+"""
+命令行入口：并发刷新城市地铁数据
+
+    python -m xianmetro.fetch [城市 ...] [--workers N]
+"""
+
+from xianmetro.fetch.refresh import main
+
+raise SystemExit(main())
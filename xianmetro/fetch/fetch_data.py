@@ -5,32 +5,352 @@
 提供地铁站点列表、线路颜色等查询功能。
 """
 
+import hashlib
 import json
-import requests
+import os
+import threading
+from collections import OrderedDict
 
-from xianmetro.utils.load_config import get_update_link, get_update_links
+from xianmetro.utils.calc_distance import haversine
+from xianmetro.utils.load_config import (
+    get_update_link, get_update_links, get_network_settings,
+    get_city_graph_limit
+)
+from xianmetro.utils.write_file import write_atomic
 
+# 本地地铁数据文件（未选择城市时使用）
+DATA_FILE = 'metro_info.json'
 
-def get_metro_info(city="西安"):
+# 当前城市，None表示使用DATA_FILE
+_current_city = None
+
+# 数据文件路径 -> 数据版本号。每次写入新数据时分配新的版本号，
+# 版本号在所有城市之间唯一，用于使依赖数据的缓存失效
+_data_versions = {}
+_last_version = 0
+_version_lock = threading.Lock()  # 多个线程同时写入不同城市的数据时保护版本号
+
+# 数据文件路径 -> 更新锁。后台更新线程和刷新按钮可能同时更新同一城市，
+# 同一城市的更新依次进行，不同城市互不影响
+_update_locks = {}
+_update_locks_lock = threading.Lock()
+
+# 数据文件路径 -> 地铁数据集，按最近使用排序。与路线规划图注册表一样
+# 保留最近使用的几个城市，切换回这些城市时无需重新读取数据文件；
+# 数据版本变化后重建
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+
+# 共享的HTTP会话，复用连接池，首次联网时创建
+_session = None
+
+# 服务器返回这些状态码时重试
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/58.0.3029.110 Safari/537.3"
+)
+
+
+def create_session(retries=None, backoff_factor=None, pool_size=None):
+    """
+    创建带连接池和重试策略的HTTP会话
+
+    连接失败、读取失败或服务器返回5xx时按指数退避重试：
+    第1次重试立即进行，第n次（n≥2）重试前等待 backoff_factor * 2^(n-1) 秒。
+
+    Args:
+        retries: 最大重试次数，默认取config.yaml中network.retries
+        backoff_factor: 退避因子，默认取config.yaml中network.backoff_factor
+        pool_size: 每个主机保留的连接数，默认不少于network.refresh_workers
+
+    Returns:
+        requests.Session: HTTP会话
+    """
+    # requests导入较慢，只在真正联网时才导入
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    settings = get_network_settings()
+    if retries is None:
+        retries = settings["retries"]
+    if backoff_factor is None:
+        backoff_factor = settings["backoff_factor"]
+    if pool_size is None:
+        # 各城市的数据在同一主机上，批量刷新时每个线程都需要一个连接
+        pool_size = max(10, settings["refresh_workers"])
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def get_session():
+    """
+    获取共享的HTTP会话
+
+    Returns:
+        requests.Session: HTTP会话
+    """
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+
+def close_session():
+    """关闭共享的HTTP会话，下次联网时按当前配置重新创建"""
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def _http_cache_files(city):
+    """
+    获取城市HTTP缓存文件的路径（与数据文件同目录同名）
+
+    Args:
+        city: 城市名称
+
+    Returns:
+        tuple: (验证信息文件路径, 原始响应文件路径)
+    """
+    base = os.path.splitext(get_data_file(city))[0]
+    return base + ".http.json", base + ".response"
+
+
+def _load_http_meta(city):
+    """
+    读取城市HTTP缓存的验证信息
+
+    Args:
+        city: 城市名称
+
+    Returns:
+        dict: 验证信息，缓存不存在或损坏时返回None
+    """
+    meta_path, _ = _http_cache_files(city)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_http_cache(city, url):
+    """
+    读取城市的HTTP缓存
+
+    Args:
+        city: 城市名称
+        url: 请求地址，与缓存记录的地址不同时视为没有缓存
+
+    Returns:
+        dict: 包含etag、last_modified、sha256和原始响应body的字典；
+        没有可用的缓存时返回None
+    """
+    _, body_path = _http_cache_files(city)
+    meta = _load_http_meta(city)
+    if meta is None:
+        return None
+    try:
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except OSError:
+        return None
+    if meta.get('url') != url or \
+            hashlib.sha256(body).hexdigest() != meta.get('sha256'):
+        return None
+    meta['body'] = body
+    return meta
+
+
+def _save_http_cache(city, url, response, body, data_hash=None):
+    """
+    保存城市的HTTP缓存（先写原始响应，再写引用它的验证信息）
+
+    Args:
+        city: 城市名称
+        url: 请求地址
+        response: HTTP响应
+        body: 原始响应内容
+        data_hash: 由该响应生成的数据文件的哈希，未知时为None
+    """
+    meta_path, body_path = _http_cache_files(city)
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'data_hash': data_hash
+    }
+    write_atomic(body_path, body)
+    write_atomic(meta_path, json.dumps(meta, ensure_ascii=False)
+                 .encode('utf-8'))
+
+
+def _save_http_data_hash(city, data_hash):
+    """
+    在HTTP缓存的验证信息中记录由缓存的响应生成的数据文件的哈希
+
+    update_metro_info据此确认数据文件确实来自当前缓存的响应：
+    缓存写入后解析或保存数据失败时，验证信息中没有对应的哈希，
+    下次更新时即使服务器返回304也会重新生成数据文件。
+
+    Args:
+        city: 城市名称
+        data_hash: 数据文件的SHA-256哈希
+    """
+    meta_path, _ = _http_cache_files(city)
+    meta = _load_http_meta(city)
+    if meta is None:
+        return
+    meta['data_hash'] = data_hash
+    write_atomic(meta_path, json.dumps(meta, ensure_ascii=False)
+                 .encode('utf-8'))
+
+
+def fetch_metro_info(city="西安", url=None, session=None, timeout=None):
+    """
+    以条件请求获取地铁数据的原始响应
+
+    如果本地有该城市的HTTP缓存，请求会带上If-None-Match/If-Modified-Since，
+    服务器返回304时直接使用缓存的原始响应。返回200时更新缓存，
+    并通过比较响应内容的哈希判断数据是否真的变化。
+
+    Args:
+        city: 城市名称，默认为"西安"；None表示当前城市，HTTP缓存与
+            get_data_file(None)的数据文件同目录同名
+        url: 请求地址，默认为config.yaml中该城市的更新链接
+        session: HTTP会话，默认使用共享会话
+        timeout: (连接超时, 读取超时)，单位秒，默认取config.yaml中的设置
+
+    Returns:
+        tuple: (原始响应内容bytes, 数据是否变化)
+
+    Raises:
+        requests.RequestException: 如果重试后仍连接失败、超时或服务器返回错误
+    """
+    if timeout is None:
+        settings = get_network_settings()
+        timeout = (settings["connect_timeout"], settings["read_timeout"])
+    session = session or get_session()
+    city = city if city is not None else _current_city
+    url = url or get_update_link(city)
+
+    cached = _load_http_cache(city, url)
+    headers = {}
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached is not None:
+        return cached['body'], False
+    response.raise_for_status()
+    body = response.content
+    changed = (cached is None or
+               hashlib.sha256(body).hexdigest() != cached['sha256'])
+    try:
+        # 响应内容未变时，由它生成的数据文件仍然有效
+        _save_http_cache(city, url, response, body,
+                         None if changed else cached.get('data_hash'))
+    except OSError:
+        pass  # 缓存只用于减少下载，写入失败不影响本次结果
+    return body, changed
+
+
+def get_metro_info(city="西安", url=None, session=None, timeout=None):
     """
     从高德地图API获取地铁站点信息
 
+    使用条件请求，数据未变化时返回本地缓存的响应（见fetch_metro_info）。
+
     Args:
         city: 城市名称，默认为"西安"
+        url: 请求地址，默认为config.yaml中该城市的更新链接
+        session: HTTP会话，默认使用共享会话
+        timeout: (连接超时, 读取超时)，单位秒，默认取config.yaml中的设置
 
     Returns:
         dict: 包含地铁站点信息的JSON对象
+
+    Raises:
+        requests.RequestException: 如果重试后仍连接失败、超时或服务器返回错误
     """
-    api_url = get_update_link(city)
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/58.0.3029.110 Safari/537.3"
-        )
-    }
-    response = requests.get(api_url, headers=headers)
-    return json.loads(response.text)
+    body, _ = fetch_metro_info(city, url, session, timeout)
+    return json.loads(body)
+
+
+def update_metro_info(city=None, url=None, session=None, timeout=None):
+    """
+    从网络更新城市的本地地铁数据
+
+    同一城市的更新依次进行，后进行的更新不会重复写入先前已写入的数据。
+    服务器数据未变化（304或内容相同）且本地数据文件由缓存的响应生成时，
+    不解析也不写入文件，数据版本不变，依赖数据的缓存（路线规划图、
+    编译图缓存、路线结果缓存等）都继续有效。上次更新在解析或保存时
+    失败的，本次会用缓存的响应重新生成数据文件。
+
+    Args:
+        city: 城市名称，默认为当前城市；未选择城市时获取默认城市
+        url: 请求地址，默认为config.yaml中该城市的更新链接
+        session: HTTP会话，默认使用共享会话
+        timeout: (连接超时, 读取超时)，单位秒，默认取config.yaml中的设置
+
+    Returns:
+        bool: 本地数据是否发生了变化
+
+    Raises:
+        requests.RequestException: 如果重试后仍连接失败、超时或服务器返回错误
+    """
+    city = city if city is not None else _current_city
+    with _get_update_lock(city):
+        # HTTP缓存与数据文件使用同一个城市，未选择城市时都对应DATA_FILE
+        body, changed = fetch_metro_info(city, url, session, timeout)
+        data_hash = get_data_hash(city)
+        if not changed and data_hash is not None and \
+                data_hash == (_load_http_meta(city) or {}).get('data_hash'):
+            return False
+        save_to_file(parse_metro_info(json.loads(body)), city)
+        try:
+            _save_http_data_hash(city, get_data_hash(city))
+        except OSError:
+            pass  # 下次更新时会重新生成数据文件
+        return True
+
+
+def _get_update_lock(city):
+    """
+    获取城市数据的更新锁
+
+    Args:
+        city: 城市名称
+
+    Returns:
+        threading.Lock: 该城市数据文件的更新锁
+    """
+    path = get_data_file(city)
+    with _update_locks_lock:
+        return _update_locks.setdefault(path, threading.Lock())
 
 
 def parse_metro_info(metro_json):
@@ -38,6 +358,8 @@ def parse_metro_info(metro_json):
     解析地铁站点JSON信息
 
     将从API获取的原始JSON数据转换为结构化的站点信息列表。
+    每个站点额外记录到线路下一站的距离（next_distance，单位：公里），
+    环线的末站记录到首站的距离，线路末站不记录。
 
     Args:
         metro_json: 包含地铁站点信息的JSON对象
@@ -63,6 +385,20 @@ def parse_metro_info(metro_json):
                 'longitude': station_sl[0]
             }
             stations[station_id] = station_info
+
+        # 预先计算相邻站点间的距离，避免每次规划时重复计算
+        station_ids = list(stations.keys())
+        n = len(station_ids)
+        for idx, station_id in enumerate(station_ids):
+            if idx == n - 1 and is_loop != "1":
+                break
+            curr = stations[station_id]
+            nxt = stations[station_ids[(idx + 1) % n]]
+            curr['next_distance'] = haversine(
+                float(curr['latitude']), float(curr['longitude']),
+                float(nxt['latitude']), float(nxt['longitude'])
+            )
+
         _metro_info.append({
             'line_name': line_name,
             'is_loop': is_loop,
@@ -72,33 +408,235 @@ def parse_metro_info(metro_json):
     return _metro_info
 
 
-def save_to_file(metro_info):
+def set_current_city(city):
     """
-    将地铁站点信息保存到JSON文件
+    设置当前城市
+
+    之后未指定城市的数据读写都使用该城市的数据文件。
+
+    Args:
+        city: 城市名称，None表示使用DATA_FILE
+    """
+    global _current_city
+    _current_city = city
+
+
+def get_current_city():
+    """
+    获取当前城市
+
+    Returns:
+        str: 城市名称，未选择城市时返回None
+    """
+    return _current_city
+
+
+def save_to_file(metro_info, city=None):
+    """
+    将地铁站点信息保存到JSON文件（先写临时文件再替换，
+    读取方不会看到写了一半的文件）
 
     Args:
         metro_info: 解析后的地铁站点信息列表
+        city: 城市名称，默认为当前城市
+    """
+    path = get_data_file(city)
+    write_atomic(path, json.dumps(metro_info, ensure_ascii=False, indent=4)
+                 .encode('utf-8'))
+    _new_version(path)
+    with _datasets_lock:
+        _datasets.pop(path, None)
+
+
+def get_data_version(city=None):
     """
-    with open('metro_info.json', 'w', encoding='utf-8') as f:
-        json.dump(metro_info, f, ensure_ascii=False, indent=4)
+    获取数据版本号
+
+    每次调用save_to_file写入新数据后版本号都会变化，
+    依赖地铁数据构建的缓存可据此判断是否需要重建。
+    不同城市的版本号互不相同。
 
+    Args:
+        city: 城市名称，默认为当前城市
 
-def load_from_file():
+    Returns:
+        int: 数据版本号
+    """
+    path = get_data_file(city)
+    if path not in _data_versions:
+        _new_version(path)
+    return _data_versions[path]
+
+
+def _new_version(path):
+    """
+    为数据文件分配新的版本号
+
+    Args:
+        path: 数据文件路径
+    """
+    global _last_version
+    with _version_lock:
+        _last_version += 1
+        _data_versions[path] = _last_version
+
+
+def get_data_file(city=None):
+    """
+    获取本地地铁数据文件路径
+
+    每个城市使用各自的数据文件（如metro_info_北京.json），
+    未选择城市时使用DATA_FILE。
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        str: 数据文件路径
+    """
+    city = city if city is not None else _current_city
+    if city is None:
+        return DATA_FILE
+    base, ext = os.path.splitext(DATA_FILE)
+    return f"{base}_{city}{ext}"
+
+
+def has_data_file(city=None):
+    """
+    判断本地是否已有城市的数据文件
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        bool: 数据文件是否存在
+    """
+    return os.path.exists(get_data_file(city))
+
+
+def get_data_hash(city=None):
+    """
+    计算本地地铁数据文件内容的SHA-256哈希
+
+    与get_data_version不同，哈希只取决于文件内容，可以跨进程使用，
+    适合校验保存在磁盘上的派生数据是否过期。
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        str: 十六进制哈希字符串，文件不存在时返回None
+    """
+    try:
+        with open(get_data_file(city), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def load_from_file(city=None):
     """
     从JSON文件加载地铁站点信息
 
     如果文件不存在，则自动获取并保存数据。
 
+    Args:
+        city: 城市名称，默认为当前城市
+
     Returns:
         list: 解析后的地铁站点信息列表
     """
     try:
-        with open('metro_info.json', 'r', encoding='utf-8') as f:
+        with open(get_data_file(city), 'r', encoding='utf-8') as f:
             metro_info = json.load(f)
         return metro_info
     except FileNotFoundError:
-        save_to_file(parse_metro_info(get_metro_info()))
-        return load_from_file()
+        _download(city)
+        return load_from_file(city)
+
+
+def _download(city=None):
+    """
+    从网络获取城市的地铁数据并保存到文件
+
+    Args:
+        city: 城市名称，默认为当前城市；未选择城市时获取默认城市
+
+    Returns:
+        list: 解析后的地铁站点信息列表
+    """
+    city = city if city is not None else _current_city
+    metro_json = get_metro_info(city)
+    metro_info = parse_metro_info(metro_json)
+    save_to_file(metro_info, city)
+    return metro_info
+
+
+class MetroDataset:
+    """
+    地铁数据集类
+
+    持有一个城市的地铁数据及由其预先计算的索引（线路颜色、站点名称和
+    站点ID列表），供get_line_color等查询函数共用，避免每次查询都重新
+    读取和解析数据文件。
+    """
+
+    def __init__(self, metro_info, path, version):
+        """
+        初始化数据集
+
+        Args:
+            metro_info: 解析后的地铁站点信息列表
+            path: 数据文件路径
+            version: 数据版本号
+        """
+        self.metro_info = metro_info
+        self.path = path
+        self.version = version
+        self.line_colors = {}  # 线路名称 -> "#RRGGBB"
+        self.station_ids = []
+        self.station_names = []
+        for line in metro_info:
+            self.line_colors.setdefault(line['line_name'],
+                                        f"#{line['color']}")
+            for station_id, info in line['stations'].items():
+                self.station_ids.append(station_id)
+                self.station_names.append(info['station_name'])
+
+
+def get_dataset(city=None):
+    """
+    获取城市的地铁数据集
+
+    最近使用的几个城市（数量同cache.city_graphs）的数据集保留在内存中，
+    只在首次调用或save_to_file写入新数据后重建。数据文件无法读取时
+    重新获取数据。
+
+    Args:
+        city: 城市名称，默认为当前城市
+
+    Returns:
+        MetroDataset: 地铁数据集
+    """
+    path = get_data_file(city)
+    # 先取版本号再读文件：读取期间写入的新数据版本号更大，下次调用时重建
+    version = get_data_version(city)
+    with _datasets_lock:
+        dataset = _datasets.get(path)
+        if dataset is not None and dataset.version == version:
+            _datasets.move_to_end(path)
+            return dataset
+    try:
+        metro_info = load_from_file(city)
+    except Exception as e:
+        metro_info = _download(city)
+    dataset = MetroDataset(metro_info, path, version)
+    with _datasets_lock:
+        _datasets[path] = dataset
+        _datasets.move_to_end(path)
+        while len(_datasets) > get_city_graph_limit():
+            _datasets.popitem(last=False)
+    return dataset
 
 
 def get_id_list():
@@ -108,16 +646,7 @@ def get_id_list():
     Returns:
         list: 站点ID列表
     """
-    try:
-        metro_info = load_from_file()
-    except Exception as e:
-        metro_info = parse_metro_info(get_metro_info())
-        save_to_file(metro_info)
-    id_list = []
-    for line in metro_info:
-        for station_id in line['stations']:
-            id_list.append(station_id)
-    return id_list
+    return list(get_dataset().station_ids)
 
 
 def get_station_list():
@@ -127,16 +656,7 @@ def get_station_list():
     Returns:
         list: 站点名称列表
     """
-    try:
-        metro_info = load_from_file()
-    except Exception as e:
-        metro_info = parse_metro_info(get_metro_info())
-        save_to_file(metro_info)
-    name_list = []
-    for line in metro_info:
-        for station_id in line['stations']:
-            name_list.append(line['stations'][station_id]['station_name'])
-    return name_list
+    return list(get_dataset().station_names)
 
 
 def get_line_color(line_name):
@@ -149,15 +669,7 @@ def get_line_color(line_name):
     Returns:
         str: 线路颜色的十六进制表示（如"#FF0000"），未找到则返回"#000000"
     """
-    try:
-        metro_info = load_from_file()
-    except Exception as e:
-        metro_info = parse_metro_info(get_metro_info())
-        save_to_file(metro_info)
-    for line in metro_info:
-        if line['line_name'] == line_name:
-            return f"#{line['color']}"
-    return "#000000"  # 默认颜色
+    return get_dataset().line_colors.get(line_name, "#000000")  # 默认颜色
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+批量刷新模块
+
+并发更新config.yaml中所有（或指定）城市的地铁数据。每个城市的获取、解析
+和写入在线程池中独立进行，同时进行的请求数有上限；总耗时约等于最慢的
+单个城市，而不是各城市耗时之和。也可以在命令行中使用：
+
+    python -m xianmetro.fetch [城市 ...] [--workers N]
+"""
+
+import argparse
+import time
+
+from xianmetro.fetch.fetch_data import update_metro_info, get_session
+from xianmetro.utils.load_config import get_update_links, get_network_settings
+
+# 刷新结果状态
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+
+def _refresh_city(city, url, session, timeout):
+    """
+    更新单个城市的数据
+
+    Args:
+        city: 城市名称
+        url: 请求地址，None表示使用config.yaml中的更新链接
+        session: HTTP会话
+        timeout: (连接超时, 读取超时)
+
+    Returns:
+        dict: 包含status、error、elapsed的结果字典
+    """
+    begin = time.perf_counter()
+    try:
+        changed = update_metro_info(city, url, session, timeout)
+        status, error = (UPDATED if changed else UNCHANGED), None
+    except Exception as e:
+        status, error = FAILED, f"{type(e).__name__}: {e}"
+    return {
+        "status": status,
+        "error": error,
+        "elapsed": time.perf_counter() - begin
+    }
+
+
+def refresh_cities(cities=None, max_workers=None, session=None, timeout=None):
+    """
+    并发更新多个城市的地铁数据
+
+    单个城市失败不影响其他城市，失败原因记录在结果中。
+
+    Args:
+        cities: 城市名称列表，或城市名称到请求地址的字典；
+            默认为config.yaml中update_link的全部城市
+        max_workers: 同时进行的请求数，默认取config.yaml中
+            network.refresh_workers
+        session: HTTP会话，默认使用共享会话
+        timeout: (连接超时, 读取超时)，单位秒，默认取config.yaml中的设置
+
+    Returns:
+        dict: 城市名称到结果字典的映射，顺序与cities一致；结果字典包含
+        status（"updated"、"unchanged"或"failed"）、error（失败原因）
+        和elapsed（耗时，秒）
+    """
+    if cities is None:
+        cities = list(get_update_links())
+    urls = cities if isinstance(cities, dict) else dict.fromkeys(cities)
+    if max_workers is None:
+        max_workers = get_network_settings()["refresh_workers"]
+    session = session or get_session()
+
+    # 线程池延迟导入，以免拖慢fetch模块的导入
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            city: executor.submit(_refresh_city, city, url, session, timeout)
+            for city, url in urls.items()
+        }
+        return {city: future.result() for city, future in futures.items()}
+
+
+def main(argv=None):
+    """
+    命令行入口：刷新城市数据并打印每个城市的结果
+
+    Args:
+        argv: 命令行参数列表，默认为sys.argv[1:]
+
+    Returns:
+        int: 退出码，有城市失败时为1
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m xianmetro.fetch", description="并发刷新城市地铁数据")
+    parser.add_argument("cities", nargs="*",
+                        help="要刷新的城市，默认为配置文件中的全部城市")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="同时进行的请求数")
+    args = parser.parse_args(argv)
+
+    begin = time.perf_counter()
+    report = refresh_cities(args.cities or None, args.workers)
+    for city, result in report.items():
+        line = f"{city}\t{result['status']}\t{result['elapsed']:.2f}s"
+        if result["error"]:
+            line += f"\t{result['error']}"
+        print(line)
+    failed = sum(result["status"] == FAILED for result in report.values())
+    print(f"{len(report) - failed}/{len(report)} cities refreshed "
+          f"in {time.perf_counter() - begin:.2f}s")
+    return 1 if failed else 0
@@ -6,7 +6,7 @@
 
 import os
 import yaml
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 __name__ = "i18n"
 __version__ = "0.1.0"
@@ -21,12 +21,25 @@ class I18n:
         """
         初始化国际化管理器
 
+        语言文件在第一次取文本时才读取，导入本模块不会解析YAML。
+
         Args:
             language: 语言代码，默认为 'zh_cn'
         """
         self._language = language
-        self._texts: Dict[str, Any] = {}
-        self._load_language(language)
+        self._texts: Optional[Dict[str, Any]] = None
+
+    @property
+    def texts(self) -> Dict[str, Any]:
+        """
+        当前语言的文本资源，首次访问时加载
+
+        Returns:
+            dict: 文本资源字典
+        """
+        if self._texts is None:
+            self._load_language(self._language)
+        return self._texts
 
     def _load_language(self, language: str):
         """
@@ -35,6 +48,7 @@ class I18n:
         Args:
             language: 语言代码
         """
+        self._language = language
         current_dir = os.path.dirname(os.path.abspath(__file__))
         yaml_file = os.path.join(current_dir, f"{language}.yaml")
 
@@ -63,7 +77,7 @@ class I18n:
             本地化的文本字符串
         """
         keys = key.split('.')
-        value = self._texts
+        value = self.texts
 
         for k in keys:
             if isinstance(value, dict):
@@ -98,7 +112,7 @@ class I18n:
             原始的数据结构（可能是dict、list等），未进行任何转换
         """
         keys = key.split('.')
-        value = self._texts
+        value = self.texts
 
         for k in keys:
             if isinstance(value, dict):
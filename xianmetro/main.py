@@ -9,11 +9,15 @@ import sys
 from PyQt5.QtWidgets import QApplication
 
 from xianmetro.ui.main_window import MetroPlannerUI
-from xianmetro.core import plan_route, parse_stations, name_to_id
+from xianmetro.ui.data_updater import DataUpdateThread
+from xianmetro.core import (
+    plan_routes, plan_extra_routes, get_route_graph, name_to_id,
+    find_reachable
+)
 from xianmetro.fetch import (
-    get_metro_info,
-    parse_metro_info,
-    save_to_file,
+    update_metro_info,
+    set_current_city,
+    has_data_file,
     get_line_color
 )
 from xianmetro.utils import (
@@ -22,10 +26,64 @@ from xianmetro.utils import (
     format_route_output_verbose,
     get_price_text,
     get_default_city,
-    get_default_lang
+    get_default_lang,
+    get_reachability_limits
 )
 from xianmetro.i18n import get_text, load_language
 
+# 在三种策略之外最多展示的备选路线数量
+MAX_ALTERNATIVES = 5
+
+
+def refresh_station_inputs(window, city):
+    """
+    刷新站点输入下拉框的选项
+
+    Args:
+        window: 主窗口
+        city: 城市名称
+    """
+    stations = get_route_graph(city).stations
+    station_names = [station.name for station in stations.values()]
+    station_ids = []
+    start_options = list(dict.fromkeys(station_names + station_ids))
+    window.start_input.clear()
+    window.end_input.clear()
+    window.start_input.addItems(start_options)
+    window.end_input.addItems(start_options)
+
+
+def apply_data_update(window, city, changed, error, current_city):
+    """
+    后台数据更新完成后更新界面
+
+    数据有变化且仍是当前城市时刷新站点选项，并保留已输入的起终点；
+    离线或请求失败时继续使用本地数据。站点的解析和路线规划都从
+    get_route_graph()取当前数据，新数据写入后立即生效。
+
+    Args:
+        window: 主窗口
+        city: 更新的城市名称
+        changed: 数据是否变化
+        error: 错误信息，成功时为空字符串
+        current_city: 界面当前选择的城市
+
+    Returns:
+        bool: 是否刷新了站点选项
+    """
+    if error:
+        print(f"Warning: Background update of {city} failed: {error}")
+        return False
+    if not changed or city != current_city:
+        return False
+    start_text = window.start_input.text()
+    end_text = window.end_input.text()
+    refresh_station_inputs(window, city)
+    window.start_input.setText(start_text)
+    window.end_input.setText(end_text)
+    show_message(window, get_text("messages.data_updated", city=city))
+    return True
+
 
 def main():
     """
@@ -34,13 +92,15 @@ def main():
     # 获取默认城市
     default_city = get_default_city()
     
-    # 初始化默认城市数据
-    save_to_file(parse_metro_info(get_metro_info(default_city)))
+    # 初始化默认城市数据：有本地数据时直接使用，窗口显示后再在后台更新；
+    # 只有本地没有任何数据时才需要等待网络
+    set_current_city(default_city)
+    if not has_data_file(default_city):
+        update_metro_info(default_city)
     
     # 创建应用程序和主窗口
     app = QApplication(sys.argv)
     window = MetroPlannerUI()
-    stations = parse_stations()
     
     # 设置默认城市
     current_city = window.get_city() or default_city
@@ -49,35 +109,34 @@ def main():
         """
         加载指定城市的地铁数据
         
+        每个城市的数据保存在各自的文件中，最近使用的城市的路线规划图
+        保留在内存里，切换回这些城市时无需重新获取和解析数据。
+        
         Args:
             city: 城市名称
-            
-        Returns:
-            dict: 站点字典
         """
-        metro_json = get_metro_info(city)
-        metro_info = parse_metro_info(metro_json)
-        save_to_file(metro_info)
-        return parse_stations()
+        set_current_city(city)
+        if not has_data_file(city):
+            update_metro_info(city)
+        get_route_graph(city)
 
     # 加载当前城市数据
-    stations = load_city_data(current_city)
+    load_city_data(current_city)
 
-    def refresh_station_inputs(city):
+    def resolve_station(stations, text):
         """
-        刷新站点输入下拉框的选项
-        
+        将输入的站名或ID解析为站点ID，优先ID
+
         Args:
-            city: 城市名称
+            stations: 站点字典
+            text: 输入文本
+
+        Returns:
+            str: 站点ID，无法解析时返回None
         """
-        from xianmetro.fetch import get_station_list
-        station_names = get_station_list()
-        station_ids = []
-        start_options = list(dict.fromkeys(station_names + station_ids))
-        window.start_input.clear()
-        window.end_input.clear()
-        window.start_input.addItems(start_options)
-        window.end_input.addItems(start_options)
+        if stations.get(text):
+            return text
+        return name_to_id(stations, text)
 
     def update_routes():
         """
@@ -85,6 +144,7 @@ def main():
         1. 最少换乘
         2. 最少站点
         3. 最短距离
+        以及三者之间互不支配的折中路线和其他走法（备选方案标签页）。
         
         支持输入站名或ID，优先ID。
         结果显示每个站点一行，包含上车、换乘和下车提示。
@@ -102,16 +162,14 @@ def main():
             show_message(window, get_text("messages.easter_egg_secret"))
             return
         
-        # 允许输入站名或ID，优先ID
-        start_id = stations.get(start_input) and start_input
-        end_id = stations.get(end_input) and end_input
-
-        if not start_id:
-            start_id = name_to_id(stations, start_input)
-        if not end_id:
-            end_id = name_to_id(stations, end_input)
+        # 允许输入站名或ID，优先ID；站点与路线规划使用同一份当前数据
+        stations = get_route_graph().stations
+        start_id = resolve_station(stations, start_input)
+        end_id = resolve_station(stations, end_input)
+        window.map_widget.clear_reachable()
 
         # 验证输入
+        window.set_alternative_count(0)
         if not start_id or not end_id:
             show_message(window, get_text("messages.invalid_input"))
             for idx in range(3):
@@ -132,11 +190,15 @@ def main():
             window.on_route_selector_changed()
             return
             
-        # 路径规划 - 三种策略
-        results = []
-        for strategy in [1, 2, 3]:
-            result = plan_route(start_id, end_id, strategy=strategy)
-            results.append(result)
+        # 路径规划 - 三种策略的路线经过路线结果缓存、路线表和按起点缓存的
+        # 最短路径树得到，只更换终点时无需重新搜索（相同路线为同一对象）
+        results = list(
+            plan_routes(start_id, end_id, (1, 2, 3), use_trees=True).values()
+        )
+        # 备选方案：三种策略之外的折中路线和其他走法，同一起终点只搜索一次
+        alternatives = plan_extra_routes(start_id, end_id, MAX_ALTERNATIVES)
+        window.set_alternative_count(len(alternatives))
+        results += alternatives
 
         # 构建线路颜色字典
         line_colors = {}
@@ -147,20 +209,24 @@ def main():
                     if line_name not in line_colors:
                         line_colors[line_name] = get_line_color(line_name)
 
-        # 输出各方案
+        # 输出各方案，相同路线只格式化一次
+        formatted = {}
         for idx, result in enumerate(results):
             if result:
-                item_list, icon_list = format_route_output_verbose(
-                    result["route"],
-                    stations,
-                    get_line_color
-                )
-                info_text = (
-                    f"{get_text('info.total_stops', '总站点数: {stops}').format(stops=result['total_stops'])}\n"
-                    f"{get_text('info.total_distance', '总距离: {distance} km').format(distance=result['total_distance'])}\n"
-                    f"{get_text('info.transfer_times', '换乘次数: {times}').format(times=result['transfers'])}\n"
-                    f"{get_price_text(result['total_distance'], window.get_city(), calc_price)}"
-                )
+                if id(result) not in formatted:
+                    item_list, icon_list = format_route_output_verbose(
+                        result["route"],
+                        stations,
+                        get_line_color
+                    )
+                    info_text = (
+                        f"{get_text('info.total_stops', '总站点数: {stops}').format(stops=result['total_stops'])}\n"
+                        f"{get_text('info.total_distance', '总距离: {distance} km').format(distance=result['total_distance'])}\n"
+                        f"{get_text('info.transfer_times', '换乘次数: {times}').format(times=result['transfers'])}\n"
+                        f"{get_price_text(result['total_distance'], window.get_city(), calc_price)}"
+                    )
+                    formatted[id(result)] = (item_list, icon_list, info_text)
+                item_list, icon_list, info_text = formatted[id(result)]
                 window.store_route_result(
                     idx,
                     item_list=item_list,
@@ -179,6 +245,29 @@ def main():
         # 触发显示更新
         window.on_route_selector_changed()
 
+    def on_reachable_clicked():
+        """
+        可达范围按钮点击事件处理函数：在地图上高亮起点在配置范围内
+        可到达的全部站点
+        """
+        start_input = window.get_start_station().strip()
+        stations = get_route_graph().stations
+        start_id = resolve_station(stations, start_input)
+        if not start_id:
+            show_message(window, get_text("messages.invalid_input"))
+            return
+        reachable = find_reachable(start_id, **get_reachability_limits())
+        window.map_widget.clear_route()
+        window.map_widget.set_reachable(reachable, stations, start_id)
+        show_message(
+            window,
+            get_text(
+                "messages.reachable_summary",
+                station=stations[start_id].name,
+                count=len(reachable) - 1
+            )
+        )
+
     def on_plan_clicked():
         """
         规划路线按钮点击事件处理函数
@@ -189,14 +278,15 @@ def main():
         """
         刷新按钮点击事件处理函数
         """
-        nonlocal stations
         city = window.get_city() or default_city
         try:
-            stations = load_city_data(city)
-            refresh_station_inputs(city)
+            changed = update_metro_info(city)
+            load_city_data(city)
+            refresh_station_inputs(window, city)
             show_message(
                 window,
-                get_text("messages.data_refreshed", city=city)
+                get_text("messages.data_refreshed" if changed
+                         else "messages.data_unchanged", city=city)
             )
         except Exception as e:
             show_message(
@@ -208,12 +298,23 @@ def main():
         """
         城市切换事件处理函数
         """
-        nonlocal stations
         city = window.get_city() or default_city
-        stations = load_city_data(city)
-        refresh_station_inputs(city)
+        load_city_data(city)
+        refresh_station_inputs(window, city)
         show_message(window, get_text("messages.city_switched", city=city))
 
+    def on_data_checked(city, changed, error):
+        """
+        后台数据更新完成的处理函数（见apply_data_update）
+
+        Args:
+            city: 城市名称
+            changed: 数据是否变化
+            error: 错误信息，成功时为空字符串
+        """
+        apply_data_update(window, city, changed, error,
+                          window.get_city() or default_city)
+
     def on_lang_changed():
         """
         语言切换事件处理函数
@@ -227,12 +328,16 @@ def main():
     # 连接信号和槽
     window.plan_btn.clicked.connect(on_plan_clicked)
     window.refresh_btn.clicked.connect(on_refresh_clicked)
+    window.reachable_action.triggered.connect(on_reachable_clicked)
     window.city_input.currentTextChanged.connect(on_city_changed)
     window.lang_input.currentTextChanged.connect(on_lang_changed)
     window.route_selector.currentItemChanged.connect(window.on_route_selector_changed)
 
-    # 显示窗口并启动应用程序
+    # 显示窗口，并在后台确认当前城市的数据是否有更新
     window.show()
+    update_thread = DataUpdateThread(current_city, window)
+    update_thread.data_checked.connect(on_data_checked)
+    update_thread.start()
     sys.exit(app.exec_())
 
 
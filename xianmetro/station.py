@@ -1,7 +1,8 @@
 """
 站点数据结构模块
 
-定义地铁站点和线路的数据模型。
+定义地铁站点和线路的数据模型。两个类都使用__slots__，
+实例不带__dict__，同时加载多个城市的数据时占用的内存更少。
 """
 
 
@@ -11,9 +12,13 @@ class StationInLine:
     
     表示某个站点在特定线路上的信息，包括前后站点关系。
     """
-    
+
+    __slots__ = ("station_id", "line_id", "line_name", "prev_station_id",
+                 "next_station_id", "prev_distance", "next_distance")
+
     def __init__(self, station_id, line_id, line_name,
-                 prev_station_id=None, next_station_id=None):
+                 prev_station_id=None, next_station_id=None,
+                 prev_distance=None, next_distance=None):
         """
         初始化线路中的站点
         
@@ -23,12 +28,16 @@ class StationInLine:
             line_name: 线路名称
             prev_station_id: 前一站点的ID（可选）
             next_station_id: 后一站点的ID（可选）
+            prev_distance: 到前一站点的距离，单位：公里（可选）
+            next_distance: 到后一站点的距离，单位：公里（可选）
         """
         self.station_id = station_id
         self.line_id = line_id
         self.line_name = line_name
         self.prev_station_id = prev_station_id
         self.next_station_id = next_station_id
+        self.prev_distance = prev_distance
+        self.next_distance = next_distance
 
 
 class Station:
@@ -38,7 +47,9 @@ class Station:
     表示一个地铁站点的完整信息，包括名称、位置和所属线路。
     一个站点可能属于多条线路（换乘站）。
     """
-    
+
+    __slots__ = ("name", "id", "line", "coords")
+
     def __init__(self, name, id, line, coords):
         """
         初始化地铁站点
@@ -54,8 +65,11 @@ class Station:
         """
         self.name = name
         self.id = id
-        assert all(isinstance(item, StationInLine) for item in line), \
-            "line must be a list of StationInLine objects"
+        if __debug__:
+            # 逐项检查而不是all()加生成器，构造大量站点时开销更小
+            for item in line:
+                assert isinstance(item, StationInLine), \
+                    "line must be a list of StationInLine objects"
         self.line = line
         assert isinstance(coords, tuple), "coords must be a tuple"
         self.coords = coords  # (latitude, longitude)
@@ -0,0 +1,49 @@
+"""
+后台数据更新模块
+
+在后台线程中向服务器确认城市数据是否有更新，有更新时写入新数据并
+预先构建路线规划图，完成后通过信号通知界面，界面线程不会因网络而阻塞。
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from xianmetro.fetch import update_metro_info
+from xianmetro.core import get_route_graph
+
+
+class DataUpdateThread(QThread):
+    """
+    城市数据后台更新线程
+
+    信号data_checked(城市, 数据是否变化, 错误信息)在线程结束前发出，
+    成功时错误信息为空字符串。
+    """
+
+    data_checked = pyqtSignal(str, bool, str)
+
+    def __init__(self, city, parent=None, url=None, session=None):
+        """
+        初始化后台更新线程
+
+        Args:
+            city: 城市名称
+            parent: 父对象
+            url: 请求地址，默认为config.yaml中该城市的更新链接
+            session: HTTP会话，默认使用共享会话
+        """
+        super().__init__(parent)
+        self.city = city
+        self.url = url
+        self.session = session
+
+    def run(self):
+        """向服务器确认数据，有更新时写入并构建新的路线规划图"""
+        try:
+            changed = update_metro_info(self.city, self.url, self.session)
+            if changed:
+                # 在后台完成构建，界面线程切换时直接取用注册表中的新图
+                get_route_graph(self.city)
+        except Exception as e:
+            self.data_checked.emit(self.city, False, str(e))
+            return
+        self.data_checked.emit(self.city, changed, "")
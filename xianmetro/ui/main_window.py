@@ -275,9 +275,14 @@ class MetroPlannerUI(QWidget):
             get_text("ui.reset_zoom"),
             triggered=self._on_reset_zoom
         )
+        self.reachable_action = Action(
+            FluentIcon.GLOBE,
+            get_text("ui.show_reachable")
+        )
         self.map_command_bar.addAction(self.zoom_in_action)
         self.map_command_bar.addAction(self.zoom_out_action)
         self.map_command_bar.addAction(self.reset_zoom_action)
+        self.map_command_bar.addAction(self.reachable_action)
         map_layout.addWidget(self.map_command_bar)
 
         # 地图滚动区域
@@ -301,6 +306,8 @@ class MetroPlannerUI(QWidget):
 
         # 存储路线结果用于切换标签页
         self.route_results = [None, None, None]  # 三种策略的结果
+        # 标签页键，前三个为固定策略，其后为备选路线
+        self.route_keys = ["transfer", "stops", "distance"]
 
     def clear_result_area(self, idx=None):
         """
@@ -393,11 +400,44 @@ class MetroPlannerUI(QWidget):
 
         self.result_vlayout.addWidget(card)
 
+    def _current_route_index(self):
+        """
+        获取当前标签页对应的路线结果索引
+
+        Returns:
+            int: 路线结果索引
+        """
+        current_tab = self.route_selector.currentRouteKey()
+        if current_tab in self.route_keys:
+            return self.route_keys.index(current_tab)
+        return 0
+
+    def set_alternative_count(self, count):
+        """
+        设置备选路线标签页的数量
+
+        固定的三个策略标签页之后追加"备选方案N"标签页，多余的会被移除。
+
+        Args:
+            count: 备选路线数量
+        """
+        current_tab = self.route_selector.currentRouteKey()
+        for key in self.route_keys[3:]:
+            self.route_selector.removeWidget(key)
+        self.route_keys = self.route_keys[:3]
+        for i in range(count):
+            key = f"alternative_{i + 1}"
+            self.route_selector.addItem(
+                key, get_text("strategy.alternative", index=i + 1))
+            self.route_keys.append(key)
+        self.route_results = (self.route_results[:3]
+                              + [None] * (len(self.route_keys) - 3))
+        if current_tab not in self.route_keys:
+            self.route_selector.setCurrentItem("transfer")
+
     def update_map_display(self):
         """根据当前选择更新地图显示"""
-        current_tab = self.route_selector.currentRouteKey()
-        idx_map = {"transfer": 0, "stops": 1, "distance": 2}
-        idx = idx_map.get(current_tab, 0)
+        idx = self._current_route_index()
 
         result = self.route_results[idx]
         if result and result.get("route_data"):
@@ -410,9 +450,7 @@ class MetroPlannerUI(QWidget):
 
     def on_route_selector_changed(self):
         """处理路线选择器标签页切换事件"""
-        current_tab = self.route_selector.currentRouteKey()
-        idx_map = {"transfer": 0, "stops": 1, "distance": 2}
-        idx = idx_map.get(current_tab, 0)
+        idx = self._current_route_index()
 
         # 清空并显示选择的路线结果
         self.clear_result_area()
@@ -444,7 +482,7 @@ class MetroPlannerUI(QWidget):
         存储路线结果用于稍后切换标签页时显示
 
         Args:
-            idx: 策略索引（0-2）
+            idx: 路线结果索引（0-2为三种策略，其后为备选路线）
             item_list: 结果项列表
             icon_list: 图标列表
             info_text: 信息文本
@@ -510,9 +548,13 @@ class MetroPlannerUI(QWidget):
             "stops", get_text("strategy.least_stops"))
         self.route_selector.setItemText(
             "distance", get_text("strategy.shortest_distance"))
+        for i, key in enumerate(self.route_keys[3:]):
+            self.route_selector.setItemText(
+                key, get_text("strategy.alternative", index=i + 1))
         self.zoom_in_action.setText(get_text("ui.zoom_in"))
         self.zoom_out_action.setText(get_text("ui.zoom_out"))
         self.reset_zoom_action.setText(get_text("ui.reset_zoom"))
+        self.reachable_action.setText(get_text("ui.show_reachable"))
         
         # # 刷新语言下拉列表，保持当前选择
         # current_lang_code = self.get_lang()
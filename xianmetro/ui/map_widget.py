@@ -32,6 +32,8 @@ class MapWidget(QWidget):
         self.setMinimumSize(400, 600)
         self.route_data = None  # 存储路线信息
         self.stations_dict = None  # 存储所有站点信息
+        self.reachable = None  # 可达站点ID到代价列表的映射
+        self.reachable_origin = None  # 可达范围的起点站ID
         self.scale_factor = 1.0  # 缩放系数
         self.pan_offset_x = 0.0  # X方向平移偏移
         self.pan_offset_y = 0.0  # Y方向平移偏移
@@ -81,6 +83,26 @@ class MapWidget(QWidget):
         self.route_data = None
         self.update()
 
+    def set_reachable(self, reachable, stations_dict, origin=None):
+        """
+        设置要高亮显示的可达范围
+
+        Args:
+            reachable: 可达站点ID到代价列表的映射（find_reachable的返回值）
+            stations_dict: 所有站点字典（id -> Station对象）
+            origin: 起点站ID（可选），以上车图标标出
+        """
+        self.reachable = reachable
+        self.reachable_origin = origin
+        self.stations_dict = stations_dict
+        self.update()
+
+    def clear_reachable(self):
+        """清除可达范围高亮"""
+        self.reachable = None
+        self.reachable_origin = None
+        self.update()
+
     def zoom_in(self):
         """放大地图"""
         self.scale_factor = min(self.scale_factor * 1.2, 5.0)
@@ -136,7 +158,7 @@ class MapWidget(QWidget):
         painter.setClipPath(path)
         painter.fillRect(self.rect(), QColor("#f4f7fa"))
 
-        if not self.route_data or not self.stations_dict:
+        if not (self.route_data or self.reachable) or not self.stations_dict:
             # 绘制占位符文本
             painter.setPen(QColor("#999"))
             painter.setFont(QFont("Microsoft YaHei", 14))
@@ -147,14 +169,19 @@ class MapWidget(QWidget):
             )
             return
 
-        # 收集路线中的所有坐标
+        # 收集路线和可达范围中的所有坐标
         all_coords = []
-        for segment in self.route_data:
+        for segment in self.route_data or []:
             for station_id in segment["stations"]:
                 station = self.stations_dict.get(station_id)
                 if (station and station.coords and isinstance(
                         station.coords, tuple) and len(station.coords) >= 2):
                     all_coords.append(station.coords)
+        for station_id in self.reachable or {}:
+            station = self.stations_dict.get(station_id)
+            if (station and station.coords and isinstance(
+                    station.coords, tuple) and len(station.coords) >= 2):
+                all_coords.append(station.coords)
 
         if not all_coords:
             return
@@ -203,6 +230,12 @@ class MapWidget(QWidget):
                  self.scale_factor + offset_y)
             return QPointF(x, y)
 
+        # 绘制可达范围高亮（位于路线下方）
+        if self.reachable:
+            self._draw_reachable(painter, coord_to_point)
+        if not self.route_data:
+            return
+
         # 识别特殊站点（上车、下车、换乘）
         boarding_station = None  # 第一段的第一个站点
         alighting_station = None  # 最后一段的最后一个站点
@@ -370,3 +403,34 @@ class MapWidget(QWidget):
                     # Draw text
                     painter.setPen(QColor("#333"))
                     painter.drawText(text_rect, Qt.AlignCenter, station.name)
+
+    def _draw_reachable(self, painter, coord_to_point):
+        """
+        绘制可达范围高亮：所需换乘越少颜色越深
+
+        Args:
+            painter: 绘图对象
+            coord_to_point: 经纬度到组件坐标的转换函数
+        """
+        alphas = (200, 130, 70)  # 直达、换乘1次、换乘2次及以上
+        painter.setPen(Qt.NoPen)
+        for station_id, costs in self.reachable.items():
+            station = self.stations_dict.get(station_id)
+            if not (station and station.coords and isinstance(
+                    station.coords, tuple) and len(station.coords) >= 2):
+                continue
+            point = coord_to_point(station.coords[0], station.coords[1])
+            transfers = min(cost[0] for cost in costs)
+            color = QColor("#3b82f6")
+            color.setAlpha(alphas[min(transfers, len(alphas) - 1)])
+            painter.setBrush(QBrush(color))
+            painter.drawEllipse(point, 7, 7)
+
+        origin = self.stations_dict.get(self.reachable_origin)
+        if origin and origin.coords and not self.up_icon.isNull():
+            point = coord_to_point(origin.coords[0], origin.coords[1])
+            icon_size = 24
+            icon_rect = QRectF(point.x() - icon_size / 2,
+                               point.y() - icon_size / 2,
+                               icon_size, icon_size)
+            painter.drawPixmap(icon_rect.toRect(), self.up_icon)
@@ -9,13 +9,43 @@ __version__ = "0.1.0"
 __author__ = "imoscarz"
 __description__ = "工具函数，包括UI辅助、距离计算、价格计算等功能。"
 
+import importlib
+
 from .calc_distance import *
 from .calc_price import *
-from .ui_helper import show_message, format_route_output_verbose, get_price_text
 from .load_config import (
     load_config,
     get_default_city,
     get_default_lang,
+    get_reachability_limits,
+    get_network_settings,
+    get_route_cache_size,
+    get_city_graph_limit,
     get_update_links,
     get_update_link
 )
+from .write_file import write_atomic
+
+# 界面辅助函数依赖PyQt5和qfluentwidgets，首次访问时才导入，
+# 使核心计算模块可以在没有图形界面依赖的环境中使用
+_UI_HELPERS = ("show_message", "format_route_output_verbose", "get_price_text")
+
+
+def __getattr__(name):
+    """
+    按需导入界面辅助函数
+
+    Args:
+        name: 属性名
+
+    Returns:
+        object: ui_helper模块中的同名函数
+
+    Raises:
+        AttributeError: 如果属性不存在
+    """
+    if name in _UI_HELPERS:
+        # 本包覆盖了__name__，相对导入无法定位子模块，因此使用完整模块名
+        ui_helper = importlib.import_module("xianmetro.utils.ui_helper")
+        return getattr(ui_helper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
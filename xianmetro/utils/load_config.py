@@ -5,7 +5,6 @@
 """
 
 import os
-import yaml
 from typing import Dict, Any
 
 
@@ -16,6 +15,9 @@ def load_config() -> Dict[str, Any]:
     Returns:
         dict: 配置信息字典
     """
+    # yaml只在读取配置时导入，避免拖慢核心模块的导入
+    import yaml
+
     config_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     config_file = os.path.join(config_dir, "config.yaml")
     
@@ -66,6 +68,64 @@ def get_default_lang() -> str:
     return config.get("defaults", {}).get("lang", "zh_cn")
 
 
+def get_route_cache_size() -> int:
+    """
+    获取路线结果缓存的容量
+
+    Returns:
+        int: 最多缓存的路线结果条数，0表示不缓存
+    """
+    config = load_config()
+    return int((config.get("cache") or {}).get("route_results", 256) or 0)
+
+
+def get_city_graph_limit() -> int:
+    """
+    获取同时保留在内存中的城市路线规划图数量
+
+    Returns:
+        int: 最多保留的城市数
+    """
+    config = load_config()
+    return int((config.get("cache") or {}).get("city_graphs", 3) or 1)
+
+
+def get_reachability_limits() -> Dict[str, Any]:
+    """
+    获取可达范围查询的默认上限
+
+    Returns:
+        dict: 包含max_stops、max_transfers、max_distance的字典，
+        未配置的上限为None
+    """
+    config = load_config()
+    limits = config.get("reachability") or {}
+    return {
+        "max_stops": limits.get("max_stops", 10),
+        "max_transfers": limits.get("max_transfers", 1),
+        "max_distance": limits.get("max_distance"),
+    }
+
+
+def get_network_settings() -> Dict[str, Any]:
+    """
+    获取网络请求设置
+
+    Returns:
+        dict: 包含connect_timeout、read_timeout、retries、backoff_factor、
+        refresh_workers的字典
+    """
+    config = load_config()
+    network = config.get("network") or {}
+    return {
+        "connect_timeout": float(network.get("connect_timeout", 5)),
+        "read_timeout": float(network.get("read_timeout", 15)),
+        "retries": int(network.get("retries", 3)),
+        "backoff_factor": float(network.get("backoff_factor", 0.5)),
+        "refresh_workers": max(1, int(network.get("refresh_workers", 4))),
+    }
+
+
 def get_update_links() -> Dict[str, str]:
     """
     获取城市地铁数据更新链接
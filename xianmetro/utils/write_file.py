@@ -0,0 +1,34 @@
+"""
+文件写入工具模块
+
+提供原子写入功能：读取方要么看到旧文件，要么看到完整的新文件。
+"""
+
+import os
+import tempfile
+
+
+def write_atomic(path, data):
+    """
+    写入文件（先写临时文件再替换，避免留下不完整的文件）
+
+    临时文件与目标文件在同一目录且名称唯一，多个线程或进程同时写入
+    同一文件时不会互相覆盖临时文件，最后完成替换的写入生效。
+
+    Args:
+        path: 文件路径
+        data: 文件内容（bytes）
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp",
+                                    dir=directory or ".")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise